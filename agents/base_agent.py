@@ -1,8 +1,29 @@
 # agents/base_agent.py
+import os
 from core.llm import ModelManager
-from config.settings import ROOMS
+from core.logger import log_since_round
+from config.settings import ROOMS, DECISION_MODE, PROMPT_TOKEN_BUDGET
+
+# Movement options per room (the room itself first, then its neighbours), rendered once
+MOVE_OPTIONS = {loc: [loc.capitalize()] + [room.capitalize() for room in adj] for loc, adj in ROOMS.items()}
+MOVE_OPTIONS_STR = {loc: "\n".join(options) for loc, options in MOVE_OPTIONS.items()}
+
+
+class _Slots(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def bind_templates(templates, **static):
+    """
+    Fills the static slots of prompt templates (agent name, teammates) once, leaving the per-call
+    slots as {slot} for str.format. Returns {kind: template}.
+    """
+    return {kind: template.format_map(_Slots(static)) for kind, template in templates.items()}
 
 class BaseAgent:
+    uses_llm = True  # False for rule-based seats, which the engine leaves out of LLM batches
+
     def __init__(self, name, color, role, model_name):
         self.name = name
         self.color = color
@@ -10,12 +31,74 @@ class BaseAgent:
         self.model_name = model_name
         self.llm = ModelManager.get_instance()
         self.action_num = 0
+        self.log_store = None  # LogManager of the current game, set by the engine
 
     def think_and_act(self, world_view, round_num):
         """
         Main decision loop for the movement phase.
         Returns tuple: (action_type, target/destination, raw_reasoning)
         """
+        request = self.prepare_action(world_view, round_num)
+        return self.resolve_action(request, self.respond(request))
+
+    def respond(self, request):
+        """
+        Answers a request dict ('system', 'user', 'temperature', optional 'call_type', 'options' and
+        'static_system', which tells the backend the system prompt is the same on every call).
+        In "score" DECISION_MODE, closed-choice requests return the highest log-probability option
+        instead of sampling free text.
+        """
+        if DECISION_MODE == "score" and request.get("options"):
+            ranked = self.llm.score_options(self.model_name, request["system"], request["user"], request["options"], agent_name=self.name)
+            return ranked[0][0] if ranked else ""
+        return self.llm.generate(
+            self.model_name, request["system"], request["user"], temperature=request["temperature"],
+            agent_name=self.name, call_type=request.get("call_type"), options=request.get("options"),
+            static_system=request.get("static_system", False)
+        )
+
+    def _read_file(self, path):
+        """Text of a game log: from the game's in-memory log store, or from disk when there is none."""
+        if self.log_store is not None:
+            return self.log_store.read_log(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        return ""
+
+    def _read_round_log(self, path, round_num):
+        """
+        A game log from the start of round round_num (its last ROUND_LOG_FALLBACK_CHARS characters if the round
+        has no marker), via the log store's round offsets when there is a store.
+        """
+        if self.log_store is not None:
+            return self.log_store.read_log_since(path, round_num)
+        return log_since_round(self._read_file(path), round_num)
+
+    def _fit_sections(self, call_type, sections):
+        """
+        Trims the log sections pasted into a prompt to PROMPT_TOKEN_BUDGET[call_type].
+        sections: list of (name, text, priority); returns the texts in the same order.
+        """
+        # The results log is the same for every agent and opens the prompt; it is cut the same way for all
+        fitted = self.llm.prompt_builder.fit(
+            self.model_name, sections, PROMPT_TOKEN_BUDGET.get(call_type), label=f"{self.name} {call_type}",
+            shared=("results_log",), group=call_type
+        )
+        return [fitted[name] for name, _, _ in sections]
+
+    def prepare_action(self, world_view, round_num):
+        """
+        Builds the movement prompt without calling the LLM, so the engine can batch a whole tick.
+        Returns dict with 'system', 'user', 'temperature', 'options' plus any context resolve_action needs.
+        """
+        raise NotImplementedError
+
+    def resolve_action(self, request, response):
+        """
+        Parses the LLM response for a request built by prepare_action.
+        Returns tuple: (action_type, target/destination, raw_reasoning)
+        """
         raise NotImplementedError
 
     def participate_in_discussion(self, conversation_history, world_view):
@@ -1,32 +1,92 @@
 # agents/byzantine_agent.py
-import os
-import re
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, MOVE_OPTIONS, MOVE_OPTIONS_STR, bind_templates
 from config.settings import ROOMS, MAX_MOVEMENT_PHASES
 
+# Per-call prompt templates; {name} and {teammates} are bound once per agent (see bind_templates)
+MOVEMENT_PROMPT = """
+{results_log}
+You are **{name}**.
+=== YOUR CURRENT ROUND ACTION LOG ===
+{current_round_log}
+================================
+
+Goal: TAG honest agents without being caught. You can only tag agents that are occupants in your current location. 
+You are in a movement phase.
+Teammates: {teammates}
+
+Options
+{options_str}
+
+INSTRUCTIONS:
+1. Choose ONE action from the lists above.
+2. Output ONLY the action keyword or room name. 
+3. You get 2 chances to speak. First is your initial thought, second is your follow-up after others speak.
+4. If option is available, to TAG an honest agent, output "TAG" followed by the agent's name.
+5. Do NOT write "Action:", "I will", or explain your reasoning. One word or phrase only.
+"""
+
+DISCUSSION_PROMPT = """
+=== Past rounds results =========================
+{results_log}
+
+=== What has been said in the ongoing discussion and the previous discussion. ===
+{recent_discussion}
+======================
+
+You are **{name}**. You are in a discussion phase. 
+=== Your personal memory log of what you saw in the most recent round ===
+{recent_action_log}
+============================================
+
+Your Teammates: {teammates}
+INSTRUCTIONS:
+1. Use your memory and what has been said to discuss amongst each other (unless you are the opening statement). Provide useful, unique observations.
+2. Check the discussion log above.  If you ({name}) have ALREADY stated your location or alibi in this current discussion, DO NOT repeat it. Instead, provide a new observation or insight from your perspective.
+3. Discuss amongst each other. Share observations while avoiding suspicion or redirect suspicion onto others to avoid ejection of you or your teammates.
+4. You get 2 chances to speak. First is your initial thought, second is your follow-up after others speak.
+5. Keep it short (< 30 words).
+6. Speak in first person as if you are the agent yourself.
+7. **DO NOT** include your name or "Agent_X:" at the start.
+8. **DO NOT** use quotes. Just output the sentence.
+"""
+
+VOTE_PROMPT = """
+{results_log}
+===============================
+{recent_discussion}
+======================
+
+You are **{name}**.
+Candidates: {candidates}. 
+Teammates: {teammates}.
+
+Goal: Byzantine Victory.
+Note: Your vote is ANONYMOUS. Only total counts are seen.
+
+INSTRUCTIONS:
+1. Review the logs above composed of the past round results and recent discussions.
+2. Decide which candidate to vote for to best achieve your Goal, avoiding ejection of you or your teammates using any strategies necessary.
+3. Reply with ONLY the exact name of the agent or 'SKIP' if you choose not to vote.
+"""
+
+
 class ByzantineAgent(BaseAgent):
     def __init__(self, name, color, teammates, model_name):
         super().__init__(name, color, "byzantine", model_name)
         self.teammates = teammates 
+        self.system_prompt = self._system_prompt()  # immutable, rendered once
+        self.templates = bind_templates(
+            {"movement": MOVEMENT_PROMPT, "discussion": DISCUSSION_PROMPT, "vote": VOTE_PROMPT},
+            name=name, teammates=teammates
+        )
 
-    def _read_file(self, path):
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        return ""
-
-    def _get_current_round_log(self, full_log, round_num):
-        if not full_log: return ""
-        round_num = str(round_num)
-        pattern = f"(?:Round {round_num}/|=== Round {round_num} ===)"
-        match = re.search(pattern, full_log)
-        if match: return full_log[match.start():]
-        else: return full_log
-
-    def think_and_act(self, world_view, round_num):
-        full_action_log = self._read_file(world_view["log_path"])
+    def prepare_action(self, world_view, round_num):
         results_log = self._read_file(world_view["results_log_path"])
-        current_round_log = self._get_current_round_log(full_action_log, round_num)
+        current_round_log = self._read_round_log(world_view["log_path"], round_num)
+        results_log, current_round_log = self._fit_sections("movement", [
+            ("results_log", results_log, 1),
+            ("action_log", current_round_log, 3),
+        ])
         
         loc = world_view["self"]["location"]
         occupants = world_view["surroundings"][loc]["occupants"]
@@ -50,37 +110,35 @@ class ByzantineAgent(BaseAgent):
         if special_actions:
             options_str += "Actions:\n" + "\n".join(f"{a}" for a in special_actions) + "\n"
 
-        move_options = []
-        cap_loc = loc.capitalize()
-        move_options.append(f"{cap_loc}")
-        for room in adj:
-             capitalize_room = room.capitalize()
-             move_options.append(f"{capitalize_room}")
-        move_options_str = "\n".join(move_options)
-
-        options_str += "Available map locations to move to:\n" + move_options_str + "\n"
-
-        prompt = f"""
-{results_log}
-=== YOUR CURRENT ROUND ACTION LOG ===
-{current_round_log}
-================================
-
-Goal: TAG honest agents without being caught. You can only tag agents that are occupants in your current location. 
-You are in a movement phase.
-Teammates: {self.teammates}
-
-Options
-{options_str}
-
-INSTRUCTIONS:
-1. Choose ONE action from the lists above.
-2. Output ONLY the action keyword or room name. 
-3. You get 2 chances to speak. First is your initial thought, second is your follow-up after others speak.
-4. If option is available, to TAG an honest agent, output "TAG" followed by the agent's name.
-5. Do NOT write "Action:", "I will", or explain your reasoning. One word or phrase only.
-"""
-        response = self.llm.generate(self.model_name, self._system_prompt(), prompt, temperature=0.1)
+        move_options = list(MOVE_OPTIONS[loc])
+        options_str += "Available map locations to move to:\n" + MOVE_OPTIONS_STR[loc] + "\n"
+
+        # Shared content (results log) first so its KV state is reused across agents
+        prompt = self.templates["movement"].format(
+            results_log=results_log, current_round_log=current_round_log, options_str=options_str
+        )
+        return {
+            "system": self.system_prompt,
+            "user": prompt,
+            "temperature": 0.1,
+            "call_type": "movement",
+            "static_system": True,
+            "options": move_options + special_actions,
+            "loc": loc,
+            "adj": adj,
+            "bodies": bodies,
+            "button_used": button_used,
+            "victims": victims,
+            "last_action": last_action,
+        }
+
+    def resolve_action(self, request, response):
+        loc = request["loc"]
+        adj = request["adj"]
+        bodies = request["bodies"]
+        button_used = request["button_used"]
+        victims = request["victims"]
+        last_action = request["last_action"]
         clean_resp = response.strip().upper()
         
         # Check for TAG action first, safeguard to avoid consecutive tags in case hallucination
@@ -102,61 +160,35 @@ INSTRUCTIONS:
         return "move", loc, response
 
     def participate_in_discussion(self, conversation_history, world_view, round_num):
-        action_log = self._read_file(world_view["log_path"])
         # parse only for the most recent round
-        recent_action_log = self._get_current_round_log(action_log, round_num)
-        discussion_log = self._read_file(world_view["discussion_log_path"])
-        recent_discussion = self._get_current_round_log(discussion_log, round_num)
-        prompt = f"""
-You are in a discussion phase. 
-=== Your personal memory log of what you saw in the most recent round ===
-{recent_action_log}
-============================================
-
-=== Past rounds results =========================
-{self._read_file(world_view["results_log_path"])}
-
-=== What has been said in the ongoing discussion and the previous discussion. ===
-{recent_discussion}
-======================
-
-Your Teammates: {self.teammates}
-INSTRUCTIONS:
-1. Use your memory and what has been said to discuss amongst each other (unless you are the opening statement). Provide useful, unique observations.
-2. Check the discussion log above.  If you ({self.name}) have ALREADY stated your location or alibi in this current discussion, DO NOT repeat it. Instead, provide a new observation or insight from your perspective.
-3. Discuss amongst each other. Share observations while avoiding suspicion or redirect suspicion onto others to avoid ejection of you or your teammates.
-4. You get 2 chances to speak. First is your initial thought, second is your follow-up after others speak.
-5. Keep it short (< 30 words).
-6. Speak in first person as if you are the agent yourself.
-7. **DO NOT** include your name or "Agent_X:" at the start.
-8. **DO NOT** use quotes. Just output the sentence.
-"""
-        return self.llm.generate(self.model_name, self._system_prompt(), prompt, temperature=1.0)
+        recent_action_log = self._read_round_log(world_view["log_path"], round_num)
+        recent_discussion = self._read_round_log(world_view["discussion_log_path"], round_num)
+        results_log, recent_discussion, recent_action_log = self._fit_sections("discussion", [
+            ("results_log", self._read_file(world_view["results_log_path"]), 1),
+            ("discussion_log", recent_discussion, 2),
+            ("action_log", recent_action_log, 3),
+        ])
+        prompt = self.templates["discussion"].format(
+            results_log=results_log, recent_discussion=recent_discussion, recent_action_log=recent_action_log
+        )
+        return self.llm.generate(self.model_name, self.system_prompt, prompt, temperature=1.0, agent_name=self.name,
+                                 call_type="discussion", static_system=True)
 
     def vote(self, world_view, candidates, round_num):
-        discussion_log = self._read_file(world_view["discussion_log_path"])
         round_num = int(round_num)
-        recent_discussion = self._get_current_round_log(discussion_log, round_num-3)
+        recent_discussion = self._read_round_log(world_view["discussion_log_path"], round_num-3)
         results_log = self._read_file(world_view["results_log_path"])
-
-        prompt = f"""
-{results_log}
-===============================
-{recent_discussion}
-======================
-
-Candidates: {candidates}. 
-Teammates: {self.teammates}.
-
-Goal: Byzantine Victory.
-Note: Your vote is ANONYMOUS. Only total counts are seen.
-
-INSTRUCTIONS:
-1. Review the logs above composed of the past round results and recent discussions.
-2. Decide which candidate to vote for to best achieve your Goal, avoiding ejection of you or your teammates using any strategies necessary.
-3. Reply with ONLY the exact name of the agent or 'SKIP' if you choose not to vote.
-"""
-        response = self.llm.generate(self.model_name, self._system_prompt(), prompt)
+        results_log, recent_discussion = self._fit_sections("vote", [
+            ("results_log", results_log, 1),
+            ("discussion_log", recent_discussion, 2),
+        ])
+
+        prompt = self.templates["vote"].format(
+            results_log=results_log, recent_discussion=recent_discussion, candidates=candidates
+        )
+        request = {"system": self.system_prompt, "user": prompt, "temperature": 0.1, "call_type": "vote", "options": candidates,
+                   "static_system": True}
+        response = self.respond(request)
         clean_resp = response.strip()
         
         for cand in candidates:
@@ -167,7 +199,7 @@ INSTRUCTIONS:
     
     def _system_prompt(self):
         return f"""
-You are **{self.name}**, a **Byzantine Agent** in a spaceship social deduction simulation. As a Byzantine, you have the unique ability to Tag honest agents.
+You are a **Byzantine Agent** in a spaceship social deduction simulation. As a Byzantine, you have the unique ability to Tag honest agents.
 You are NOT a chat assistant.
 You must output concise commands during movement. During discussion, be conversational.
 You do not use pleasantries like "Great" or "Let's get started".
@@ -0,0 +1,159 @@
+# agents/heuristic_agent.py
+import random
+import re
+from agents.base_agent import BaseAgent
+from config.settings import ROOMS
+
+# Meeting reason written to the discussion log by GameState.report_body
+BODY_REPORT = re.compile(r"Body reported: (\w+) located in (\w+)")
+
+
+class HeuristicAgent(BaseAgent):
+    """
+    Rule-based seat that never calls an LLM, for fast rollouts, load tests and mixed tables where only the
+    seats under study pay for inference. Remembers who it saw where during the current round; randomness
+    comes from the global random module, so games stay reproducible with --seed.
+    """
+    uses_llm = False
+
+    def __init__(self, name, color, role, model_name):
+        super().__init__(name, color, role, model_name)
+        self.sightings = []  # {"round", "room", "others", "bodies"} per movement tick
+
+    def respond(self, request):
+        # Decisions are made in prepare_action; nothing to generate
+        return ""
+
+    def resolve_action(self, request, response):
+        action, target = request["decision"]
+        return action, target, None
+
+    def _observe(self, world_view, round_num):
+        loc = world_view["self"]["location"]
+        here = world_view["surroundings"][loc]
+        others = [o for o in here["occupants"] if o != self.name]
+        self.sightings.append({"round": round_num, "room": loc, "others": others, "bodies": list(here["bodies"])})
+        return loc, others, here["bodies"]
+
+    def _neighbour_counts(self, world_view, loc, ignore=()):
+        """(room, number of other agents in it, not counting those in ignore) for each room adjacent to loc."""
+        surroundings = world_view["surroundings"]
+        return [
+            (room, len([o for o in surroundings.get(room, {}).get("occupants", []) if o != self.name and o not in ignore]))
+            for room in ROOMS[loc]
+        ]
+
+    def _body_suspects(self, world_view, round_num):
+        """
+        Agents last co-located with a body this round, scored by how many bodies they were seen with.
+        Bodies come from own sightings and from the meeting reason in the discussion log.
+        """
+        rounds = [s for s in self.sightings if s["round"] == round_num]
+        bodies = {(body, s["room"]) for s in rounds for body in s["bodies"]}
+        discussion = self._read_round_log(world_view["discussion_log_path"], round_num)
+        bodies.update(BODY_REPORT.findall(discussion))
+
+        scores = {}
+        for body, room in sorted(bodies):
+            # Whoever was with the body when it was seen, else the last agents seen in that room
+            seen = [s for s in rounds if s["room"] == room and body in s["bodies"] and s["others"]]
+            if not seen:
+                seen = [s for s in rounds if s["room"] == room and s["others"]][-1:]
+            for name in (seen[-1]["others"] if seen else []):
+                if name != body:
+                    scores[name] = scores.get(name, 0) + 1
+        return scores
+
+    def _route(self, round_num):
+        rooms = [s["room"] for s in self.sightings if s["round"] == round_num]
+        route = [room for i, room in enumerate(rooms) if i == 0 or room != rooms[i - 1]]
+        return " then ".join(route) if route else "around"
+
+
+class HeuristicHonestAgent(HeuristicAgent):
+    """Reports any body it finds, otherwise walks towards the busiest adjacent room to witness others."""
+    def __init__(self, name, color, model_name):
+        super().__init__(name, color, "honest", model_name)
+
+    def prepare_action(self, world_view, round_num):
+        loc, others, bodies = self._observe(world_view, round_num)
+        if bodies:
+            decision = ("report", bodies[0])
+        else:
+            counts = self._neighbour_counts(world_view, loc)
+            busiest = max(count for _, count in counts)
+            decision = ("move", random.choice([room for room, count in counts if count == busiest]))
+        return {"call_type": "movement", "decision": decision}
+
+    def participate_in_discussion(self, conversation_history, world_view, round_num):
+        suspects = self._body_suspects(world_view, round_num)
+        statement = f"I went {self._route(round_num)}."
+        if suspects:
+            top = max(suspects, key=suspects.get)
+            statement += f" {top} was the last one I saw near the body, so I suspect them."
+        else:
+            statement += " I saw nobody near a body."
+        return statement
+
+    def vote(self, world_view, candidates, round_num):
+        suspects = {n: s for n, s in self._body_suspects(world_view, round_num).items() if n in candidates}
+        return max(suspects, key=suspects.get) if suspects else "SKIP"
+
+
+class HeuristicByzantineAgent(HeuristicAgent):
+    """
+    Tags honest agents found alone, self-reports its own kill when others already saw the body, flees after
+    tagging and otherwise hunts rooms holding a single honest agent. Votes for the honest agent seen near
+    a body, else for the most-mentioned honest agent to stack votes.
+    """
+    def __init__(self, name, color, teammates, model_name):
+        super().__init__(name, color, "byzantine", model_name)
+        self.teammates = teammates
+        self.tagged = {}  # round -> room of this agent's last tag
+
+    def prepare_action(self, world_view, round_num):
+        loc, others, bodies = self._observe(world_view, round_num)
+        last_action = world_view["self"].get("last_action")
+        victims = [o for o in others if o not in self.teammates]
+        counts = self._neighbour_counts(world_view, loc)
+        honest_counts = self._neighbour_counts(world_view, loc, ignore=self.teammates)
+
+        if bodies and victims and self.tagged.get(round_num) == loc:
+            # Witnesses are around our own kill: report it first to look innocent
+            decision = ("report", bodies[0])
+        elif len(victims) == 1 and last_action != "tag":
+            decision = ("tag", victims[0])
+            self.tagged[round_num] = loc
+        elif last_action == "tag":
+            emptiest = min(count for _, count in counts)
+            decision = ("move", random.choice([room for room, count in counts if count == emptiest]))
+        else:
+            isolated = [room for room, count in honest_counts if count == 1]
+            decision = ("move", random.choice(isolated or [room for room, _ in counts]))
+        return {"call_type": "movement", "decision": decision}
+
+    def _scapegoats(self, world_view, round_num):
+        return {n: s for n, s in self._body_suspects(world_view, round_num).items() if n not in self.teammates}
+
+    def participate_in_discussion(self, conversation_history, world_view, round_num):
+        scapegoats = self._scapegoats(world_view, round_num)
+        statement = f"I went {self._route(round_num)}."
+        if scapegoats:
+            top = max(scapegoats, key=scapegoats.get)
+            statement += f" {top} was hanging around the body, that looks suspicious to me."
+        else:
+            statement += " Nothing unusual on my side."
+        return statement
+
+    def vote(self, world_view, candidates, round_num):
+        honest = [c for c in candidates if c != "SKIP" and c not in self.teammates]
+        scapegoats = {n: s for n, s in self._scapegoats(world_view, round_num).items() if n in honest}
+        if scapegoats:
+            return max(scapegoats, key=scapegoats.get)
+
+        # Pile onto whoever the table already talks about most
+        discussion = self._read_round_log(world_view["discussion_log_path"], round_num)
+        discussion = re.sub(r"^\w+: ", "", discussion, flags=re.MULTILINE)  # speakers don't count as mentions
+        mentions = {c: len(re.findall(rf"\b{c}\b", discussion)) for c in honest}
+        mentions = {c: n for c, n in mentions.items() if n}
+        return max(mentions, key=mentions.get) if mentions else "SKIP"
@@ -1,64 +1,11 @@
 # agents/honest_agent.py
-import os
-import re
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, MOVE_OPTIONS, MOVE_OPTIONS_STR, bind_templates
 from config.settings import ROOMS, MAX_MOVEMENT_PHASES
 
-class HonestAgent(BaseAgent):
-    def __init__(self, name, color, model_name):
-        super().__init__(name, color, "honest", model_name)
-
-    def _read_file(self, path):
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        return ""
-
-    def _get_current_round_log(self, full_log, round_num):
-        if not full_log: return ""
-        # convert round_num back to string
-        round_num = str(round_num)
-        pattern = f"(?:Round {round_num}/|=== Round {round_num} ===)"
-        match = re.search(pattern, full_log)
-        if match: return full_log[match.start():]
-        else: return full_log[-2000:]
-
-    def think_and_act(self, world_view, round_num):
-        # 1. READ LOGS
-        full_action_log = self._read_file(world_view["log_path"])
-        results_log = self._read_file(world_view["results_log_path"])
-
-        # 2. FILTER LOG
-        current_round_log = self._get_current_round_log(full_action_log, round_num)
-
-        # 3. Setup Context
-        loc = world_view["self"]["location"]
-        adj = ROOMS[loc]
-        bodies = world_view["surroundings"][loc]["bodies"]
-        button_used = world_view["self"].get("button_used", False)
-        
-        move_options = []
-        cap_loc = loc.capitalize()
-        move_options.append(f"{cap_loc}")
-        
-        special_actions = []
-        options_str = ""
-        if bodies: 
-            special_actions.append("REPORT")
-
-        if loc == "Cafeteria" and not button_used: 
-            special_actions.append("BUTTON")
-
-        if special_actions:
-            options_str += "Actions:\n" + "\n".join(f"- {a}" for a in special_actions) + "\n"
-        for room in adj:
-             capitalize_room = room.capitalize()
-             move_options.append(f"{capitalize_room}")
-        move_options_str = "\n".join(move_options)
-        options_str += "Available movement actions:\n" + move_options_str + "\n"
-
-        prompt = f"""
+# Per-call prompt templates; {name} is bound once per agent (see bind_templates)
+MOVEMENT_PROMPT = """
 {results_log}
+You are **{name}**.
 === YOUR CURRENT ROUND ACTION LOG ===
 {current_round_log}
 ================================
@@ -73,44 +20,25 @@ INSTRUCTIONS:
 3. Do NOT write "Action:", "I will", or explain your reasoning. 
 4. Do NOT output markdown or punctuation. One word or phrase only.
 """
-        # Call synchronous generate with low temp
-        response = self.llm.generate(self.model_name, self._system_prompt(), prompt, temperature=0.1)
-        clean_resp = response.strip().upper()
-        
-        if "REPORT" in clean_resp and bodies:
-            return "report", bodies[0], response
-        if "BUTTON" in clean_resp and loc == "Cafeteria" and not button_used:
-            return "button", "meeting", response
-        for room in adj:
-            if room.upper() in clean_resp:
-                return "move", room, response
-        
-        return "move", loc, response
-
-    def participate_in_discussion(self, conversation_history, world_view, round_num):
-        full_action_log = self._read_file(world_view["log_path"])
-        recent_action_log = self._get_current_round_log(full_action_log, round_num)
-        discussion_log = self._read_file(world_view["discussion_log_path"])
-        recent_discussion = self._get_current_round_log(discussion_log, round_num)
-        prompt = f"""
-You are in a discussion phase. 
-=== Your personal memory log of what you saw in the previous round ===
-{recent_action_log}
-==================================
 
+DISCUSSION_PROMPT = """
 == Past rounds results ===
-{self._read_file(world_view["results_log_path"])}
+{results_log}
 
 === What has been said in the ongoing discussion ===
 {recent_discussion}
 ======================
-        
+
+You are **{name}**. You are in a discussion phase. 
+=== Your personal memory log of what you saw in the previous round ===
+{recent_action_log}
+==================================
 
 INSTRUCTIONS:
 1. Use your memory to determine innocent, suspicious, or incrementing behavior. Look at what has been said to discuss (unless you are the opening statement) amongst each other. 
 2. Goal: Build a consensus to eject a suspect.
-3. If you ({self.name}) saw someone safe, verify their alibi. If you saw something suspicious or incriminating, state it clearly.
-4. If you  ({self.name}) have no new info, state your location to help others build the timeline.
+3. If you ({name}) saw someone safe, verify their alibi. If you saw something suspicious or incriminating, state it clearly.
+4. If you  ({name}) have no new info, state your location to help others build the timeline.
 5. Listen to the "Current Discussion". Note what others have said, and provide unique insights from your perspective.
 6. Share observations and deduce who you suspect, if anyone, to be Byzantine agents in order to eject them. Look at strong correlations between agents' locations and bodies seen to deduce who could be responsible for eliminations. 
 7. You get 2 chances to speak. First is your initial thought, second is your follow-up after others speak.
@@ -119,20 +47,13 @@ INSTRUCTIONS:
 10. **DO NOT** include your name or "Agent_X:" at the start.
 11. **DO NOT** use quotes. Just output the sentence.
 """
-        # Call synchronous generate with high temp
-        return self.llm.generate(self.model_name, self._system_prompt(), prompt, temperature=1.0)
 
-    def vote(self, world_view, candidates, round_num):
-        discussion_log = self._read_file(world_view["discussion_log_path"])
-        round_num = int(round_num)
-        recent_discussion = self._get_current_round_log(discussion_log, round_num-3)
-        results_log = self._read_file(world_view["results_log_path"])
-
-        prompt = f"""
+VOTE_PROMPT = """
 {results_log}
 =====================
 {recent_discussion}
 ======================
+You are **{name}**.
 Candidates: {candidates}.
 
 Goal: Eject Byzantine Agents.
@@ -145,7 +66,112 @@ INSTRUCTIONS:
 3. Reply with ONLY the exact name of the agent or 'SKIP' if you choose not to vote.
 
 """
-        response = self.llm.generate(self.model_name, self._system_prompt(), prompt)
+
+
+class HonestAgent(BaseAgent):
+    def __init__(self, name, color, model_name):
+        super().__init__(name, color, "honest", model_name)
+        self.system_prompt = self._system_prompt()  # immutable, rendered once
+        self.templates = bind_templates(
+            {"movement": MOVEMENT_PROMPT, "discussion": DISCUSSION_PROMPT, "vote": VOTE_PROMPT}, name=name
+        )
+
+    def prepare_action(self, world_view, round_num):
+        # 1. READ LOGS
+        results_log = self._read_file(world_view["results_log_path"])
+
+        # 2. FILTER LOG
+        current_round_log = self._read_round_log(world_view["log_path"], round_num)
+        results_log, current_round_log = self._fit_sections("movement", [
+            ("results_log", results_log, 1),
+            ("action_log", current_round_log, 3),
+        ])
+
+        # 3. Setup Context
+        loc = world_view["self"]["location"]
+        adj = ROOMS[loc]
+        bodies = world_view["surroundings"][loc]["bodies"]
+        button_used = world_view["self"].get("button_used", False)
+        
+        move_options = list(MOVE_OPTIONS[loc])
+        
+        special_actions = []
+        options_str = ""
+        if bodies: 
+            special_actions.append("REPORT")
+
+        if loc == "Cafeteria" and not button_used: 
+            special_actions.append("BUTTON")
+
+        if special_actions:
+            options_str += "Actions:\n" + "\n".join(f"- {a}" for a in special_actions) + "\n"
+        options_str += "Available movement actions:\n" + MOVE_OPTIONS_STR[loc] + "\n"
+
+        # Shared content (results log) first so its KV state is reused across agents
+        prompt = self.templates["movement"].format(
+            results_log=results_log, current_round_log=current_round_log, options_str=options_str
+        )
+        # Generated with low temp, either alone or batched with the rest of the tick
+        return {
+            "system": self.system_prompt,
+            "user": prompt,
+            "temperature": 0.1,
+            "call_type": "movement",
+            "static_system": True,
+            "options": move_options + special_actions,
+            "loc": loc,
+            "adj": adj,
+            "bodies": bodies,
+            "button_used": button_used,
+        }
+
+    def resolve_action(self, request, response):
+        loc = request["loc"]
+        adj = request["adj"]
+        bodies = request["bodies"]
+        button_used = request["button_used"]
+        clean_resp = response.strip().upper()
+        
+        if "REPORT" in clean_resp and bodies:
+            return "report", bodies[0], response
+        if "BUTTON" in clean_resp and loc == "Cafeteria" and not button_used:
+            return "button", "meeting", response
+        for room in adj:
+            if room.upper() in clean_resp:
+                return "move", room, response
+        
+        return "move", loc, response
+
+    def participate_in_discussion(self, conversation_history, world_view, round_num):
+        recent_action_log = self._read_round_log(world_view["log_path"], round_num)
+        recent_discussion = self._read_round_log(world_view["discussion_log_path"], round_num)
+        results_log, recent_discussion, recent_action_log = self._fit_sections("discussion", [
+            ("results_log", self._read_file(world_view["results_log_path"]), 1),
+            ("discussion_log", recent_discussion, 2),
+            ("action_log", recent_action_log, 3),
+        ])
+        prompt = self.templates["discussion"].format(
+            results_log=results_log, recent_discussion=recent_discussion, recent_action_log=recent_action_log
+        )
+        # Call synchronous generate with high temp
+        return self.llm.generate(self.model_name, self.system_prompt, prompt, temperature=1.0, agent_name=self.name,
+                                 call_type="discussion", static_system=True)
+
+    def vote(self, world_view, candidates, round_num):
+        round_num = int(round_num)
+        recent_discussion = self._read_round_log(world_view["discussion_log_path"], round_num-3)
+        results_log = self._read_file(world_view["results_log_path"])
+        results_log, recent_discussion = self._fit_sections("vote", [
+            ("results_log", results_log, 1),
+            ("discussion_log", recent_discussion, 2),
+        ])
+
+        prompt = self.templates["vote"].format(
+            results_log=results_log, recent_discussion=recent_discussion, candidates=candidates
+        )
+        request = {"system": self.system_prompt, "user": prompt, "temperature": 0.1, "call_type": "vote", "options": candidates,
+                   "static_system": True}
+        response = self.respond(request)
         clean_resp = response.strip()
         
         for cand in candidates:
@@ -156,7 +182,7 @@ INSTRUCTIONS:
 
     def _system_prompt(self):
        return f"""
-You are **{self.name}**, an **Honest Agent** in a spaceship social deduction simulation.
+You are an **Honest Agent** in a spaceship social deduction simulation.
 You are NOT a chat assistant.
 You must output concise commands during movement. During discussion, be conversational.
 You do not use pleasantries like "Great" or "Let's get started".
@@ -0,0 +1,56 @@
+# compile_report.py
+# Compares the compiled CPU path (CPU_COMPILE) with eager mode for a composition's models:
+# compile warm-up time (cold or warm COMPILE_CACHE_DIR) and steady-state tokens/sec.
+#   python compile_report.py --scenario 6
+# Run it twice: the second run shows the warm-up cost games pay once the compile cache is populated.
+import argparse
+import os
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from config.model_composition import COMPOSITION
+from config.settings import COMPILE_CACHE_DIR
+from core.hf_backend import benchmark_generate, compile_for_cpu, cpu_autocast, cpu_bf16_supported, enable_compile_cache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", type=int, default=6, help="Index into COMPOSITION")
+    parser.add_argument("--models", nargs="*", default=None, help="Model ids (overrides --scenario)")
+    parser.add_argument("--new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    models = args.models
+    if models is None:
+        composition = COMPOSITION[args.scenario]
+        models = sorted({m for m in composition["honest_model"] + composition["byzantine_model"] if ":" not in m})
+
+    warm_cache = os.path.isdir(COMPILE_CACHE_DIR) and bool(os.listdir(COMPILE_CACHE_DIR))
+    enable_compile_cache()
+    print(f"Compile cache: {COMPILE_CACHE_DIR} ({'warm' if warm_cache else 'cold'}), bf16 autocast: {cpu_bf16_supported()}")
+
+    for model_name in models:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(model_name, device_map="cpu", torch_dtype=torch.float32)
+
+        _, eager_rate = benchmark_generate(model, tokenizer, args.new_tokens, args.repeats)
+
+        # torch.compile is lazy: the first call pays for compilation
+        compile_for_cpu(model)
+        with cpu_autocast(True):
+            warmup, compiled_rate = benchmark_generate(
+                model, tokenizer, args.new_tokens, args.repeats, cache_implementation="static"
+            )
+        del model
+
+        # Games on this node break even after roughly this many generated tokens
+        gain = 1 / eager_rate - 1 / compiled_rate
+        break_even = f"{warmup / gain:.0f} tokens" if gain > 0 else "never"
+        print(f"\n{model_name} ({args.new_tokens} new tokens)")
+        print(f"  warm-up : {warmup:.1f}s")
+        print(f"  speed   : eager {eager_rate:.1f} -> compiled {compiled_rate:.1f} tokens/s ({compiled_rate / eager_rate:.2f}x)")
+        print(f"  pays off: after {break_even}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,14 @@ LLAMA31_8B = "meta-llama/Llama-3.1-8B-Instruct"
 LLAMA32_1B= "meta-llama/Llama-3.2-1B-Instruct"
 QWEN25_1_5B = "Qwen/Qwen2.5-1.5B-Instruct"
 DEEPSEEK_R1_70B = "deepseek-ai/DeepSeek-R1-Distill-Llama-70B"
+STUB_RANDOM = "stub:random"  # offline stub backend, see core/stub_backend.py
+HEURISTIC = "heuristic"  # rule-based seat, no LLM (agents/heuristic_agent.py); mixes with LLM seats
 
 
 # Each dictionary represents one "Setup" that a game instance can run.
+# Optional keys: "draft_models" {target model: draft model} for assisted decoding of discussion calls,
+# "fallback_models" {model: faster model} answering calls that miss their LLM_DEADLINES deadline
+# (opt-in: it changes which model plays the seat, so leave it out of compositions used for model comparisons).
 COMPOSITION = [
     # Composition 0: Baseline - Everyone uses Llama 3
     {
@@ -44,7 +49,9 @@ COMPOSITION = [
         "honest_count": 8,
         "byzantine_count": 2,
         "honest_model": [LLAMA31_8B],
-        "byzantine_model": [LLAMA31_70B]
+        "byzantine_model": [LLAMA31_70B],
+        # Assisted decoding of discussion messages (same Llama 3 tokenizer)
+        "draft_models": {LLAMA31_70B: LLAMA32_1B, LLAMA31_8B: LLAMA32_1B},
     },
 
         # Composition 4 - David vs Goliath (d) 
@@ -54,7 +61,9 @@ COMPOSITION = [
         "honest_count": 9,
         "byzantine_count": 1,
         "honest_model": [LLAMA31_8B],
-        "byzantine_model": [LLAMA31_70B]
+        "byzantine_model": [LLAMA31_70B],
+        # Assisted decoding of discussion messages (same Llama 3 tokenizer)
+        "draft_models": {LLAMA31_70B: LLAMA32_1B, LLAMA31_8B: LLAMA32_1B},
     },
 
 
@@ -86,6 +95,56 @@ COMPOSITION = [
         
         # BYZANTINE TEAM: 1 DeepSeek, 1 Llama
         "byzantine_model": [DEEPSEEK_R1_70B, LLAMA31_70B]
+    },
+
+    # Composition 7 - Stub backend (no weights), for engine/IO benchmarks and CPU-only test runs
+    {
+        "name": "Stub_Benchmark",
+        "mode": "default",
+        "honest_count": 8,
+        "byzantine_count": 2,
+        "honest_model": [STUB_RANDOM],
+        "byzantine_model": [STUB_RANDOM]
+    },
+
+    # Composition 8 - Heuristic baseline, no inference at all (fast rollouts)
+    {
+        "name": "Heuristic_All",
+        "mode": "default",
+        "honest_count": 8,
+        "byzantine_count": 2,
+        "honest_model": [HEURISTIC],
+        "byzantine_model": [HEURISTIC]
+    },
+
+    # Composition 9 - Llama 3 Byzantines against a heuristic crew; only the Byzantine seats call the LLM
+    {
+        "name": "Llama3_Byz_vs_Heuristic",
+        "mode": "mixed",
+        "honest_count": 8,
+        "byzantine_count": 2,
+        "honest_model": [HEURISTIC],
+        "byzantine_model": [LLAMA31_8B]
+    },
+
+    # Composition 10 - Half Llama 3, half heuristic crew against heuristic Byzantines
+    {
+        "name": "Llama3_Heuristic_Mixed",
+        "mode": "mixed",
+        "honest_count": 8,
+        "byzantine_count": 2,
+        "honest_model": [LLAMA31_8B, HEURISTIC],
+        "byzantine_model": [HEURISTIC]
+    },
+
+    # Composition 11 - Stub + heuristic mixed table, for CPU-only test runs of mixed seating
+    {
+        "name": "Stub_Heuristic_Mixed",
+        "mode": "mixed",
+        "honest_count": 8,
+        "byzantine_count": 2,
+        "honest_model": [STUB_RANDOM, HEURISTIC],
+        "byzantine_model": [HEURISTIC, STUB_RANDOM]
     }
 
 
@@ -111,4 +111,122 @@ NUM_BYZ = 2
 NUM_HONEST = 8
 
 
-QUANTIZATION = True
+QUANTIZATION = True  # 4-bit bitsandbytes on GPU nodes
+# Quantization on CPU nodes: None (CPU_DTYPE weights) or "int8_dynamic" (int8 Linear weights).
+# Quantized models are saved under QUANTIZED_CACHE_DIR and reused by later runs;
+# build them ahead of time and compare against float32 with quantize_models.py.
+CPU_QUANTIZATION = None
+QUANTIZED_CACHE_DIR = "cache/quantized"
+# Compiled CPU inference: torch.compile'd forward, static KV cache, bf16 autocast if the CPU supports it.
+# Compiled kernels persist in COMPILE_CACHE_DIR, so only the first game on a node pays the full warm-up.
+# compile_report.py compares warm-up and tokens/sec against eager mode.
+CPU_COMPILE = False
+COMPILE_CACHE_DIR = "cache/inductor"
+# Weight dtype on CPU nodes. "auto" keeps the checkpoint dtype, so memory-mapped safetensors weights
+# are used without a conversion copy (fastest load, bf16 compute).
+CPU_DTYPE = "float32"
+# CPU threads for inference; None = the slurm allocation (SLURM_CPUS_PER_TASK) capped by the affinity mask.
+# Models up to CPU_WORKER_MAX_GB run a tick's requests as CPU_WORKERS concurrent single-stream calls with
+# CPU_THREADS // CPU_WORKERS threads each instead of one padded batch; sweep_threads.py finds the best value.
+CPU_THREADS = None
+CPU_WORKERS = 1
+CPU_WORKER_MAX_GB = 8
+# Models from a composition are preloaded concurrently by this many threads
+PRELOAD_WORKERS = 4
+
+# Memory budget (GB) for resident models: VRAM on GPU nodes, RAM on CPU nodes. When a model must load
+# and would not fit, the least recently used model is evicted (parked in CPU RAM if RESIDENCY_OFFLOAD
+# and it is not 4-bit quantized, otherwise dropped and reloaded on next use). None = unbounded.
+MODEL_MEMORY_BUDGET_GB = None
+RESIDENCY_OFFLOAD = True
+
+# Reuse computed KV state across calls (radix tree shared by all agents of a model),
+# so only tokens past the longest cached prefix are prefilled.
+# Cached requests run one at a time instead of as padded batches.
+KV_CACHE = False
+KV_CACHE_MAX_MB = 8192
+
+# Decoding budget (new tokens) per call type. Closed-choice calls also stop as soon as a valid option
+# is decoded; discussion stops at a newline or at a sentence end after DISCUSSION_STOP_WORDS words.
+MAX_NEW_TOKENS = {
+    "movement": 10,
+    "vote": 8,
+    "discussion": 60,
+    "default": 60,
+}
+DISCUSSION_STOP_WORDS = 20
+
+# Reuse the previous tokenization of each agent's prompt (and log section) up to where the text changed,
+# so only appended text is tokenized (needs a fast tokenizer).
+TOKENIZATION_CACHE = True
+
+# Token budget for the log sections pasted into each user prompt (results, discussion and own action log),
+# counted with the model's tokenizer. The results log, shared by every agent, keeps at most half the budget
+# (cut at the same line for every agent, so their prompts share it as a prefix); over budget, the discussion
+# then the agent's own log lose their oldest lines. None = unlimited.
+PROMPT_TOKEN_BUDGET = {
+    "movement": 2048,
+    "discussion": 3072,
+    "vote": 2048,
+}
+
+# Agents' own movement history as pasted into prompts. "compact": one line per observation and per action,
+# rendered from GameState's structured records into memory.log; "verbose": the human-readable action.log.
+OBSERVATION_FORMAT = "compact"
+# Keep writing the verbose action.log for debugging when OBSERVATION_FORMAT is "compact"
+VERBOSE_ACTION_LOG = True
+
+# "Log since round N" when a log has no marker for round N: its last ROUND_LOG_FALLBACK_CHARS characters.
+ROUND_LOG_FALLBACK_CHARS = 2000
+
+# Inference failures (OOM, bad input, server errors). A failed batch is split in half and retried, and the
+# model's batch limit drops to half the failed size; it grows back by one after LLM_BATCH_RECOVERY
+# successful full batches. A failed single request is retried up to LLM_MAX_RETRIES times with its prompt
+# halved, backing off LLM_RETRY_BACKOFF seconds (doubled each time). Counted per agent in stats.csv.
+LLM_MAX_BATCH = 64
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BACKOFF = 1.0
+LLM_BATCH_RECOVERY = 20
+
+# Per-call deadline (seconds) by call type. A request still running at its deadline is cancelled and answered
+# by the composition's "fallback_models" entry for its model, or by a default policy (stay, SKIP, pass).
+# Fallbacks are counted per agent (llm_fallbacks in stats.csv). None = no deadlines (the default, so every
+# answer comes from the seat's own model); e.g. {"movement": 120, "vote": 120, "discussion": 180}.
+LLM_DEADLINES = None
+
+# Backend serving plain model ids: "transformers" (in-process), "daemon" (shared node-local
+# inference_server.py) or "openai" (HTTP endpoint). Overridable with main.py --backend.
+LLM_BACKEND = "transformers"
+
+# Node-local inference daemon (inference_server.py): requests from all games on the node are batched
+# per model; each scheduling step waits up to DAEMON_BATCH_WINDOW seconds for more requests.
+DAEMON_SOCKET = "/tmp/amongus_inference.sock"
+DAEMON_MAX_BATCH = 32
+DAEMON_BATCH_WINDOW = 0.02
+DAEMON_LENGTH_BUCKETS = [512, 1024, 2048, 4096, 8192]  # approx. prompt tokens
+
+# Offline stub backend (model names "stub:random", "stub:seed=N", "stub:script=path"), no torch needed.
+# Simulated latency in seconds per prompt token and per generated token.
+STUB_SEED = 0
+STUB_PREFILL_LATENCY = 0.0
+STUB_TOKEN_LATENCY = 0.0
+
+# OpenAI-compatible HTTP backend (model names "openai:<served model id>"), e.g. a local vLLM or llama.cpp server
+OPENAI_BASE_URL = "http://localhost:8000/v1"
+OPENAI_API_KEY_ENV = "OPENAI_API_KEY"  # env var holding the key; "EMPTY" if unset
+OPENAI_MAX_CONCURRENCY = 16  # in-flight requests (and pooled keep-alive connections)
+OPENAI_MAX_RETRIES = 4
+OPENAI_BACKOFF = 0.5  # seconds, doubled on every retry
+OPENAI_TIMEOUT = 120
+
+# Persistent response cache keyed on (model, prompts, temperature, seed, call type, options).
+# Reruns of a seeded scenario (main.py --seed) reuse earlier answers instead of running inference;
+# games without --seed never read or write it.
+RESPONSE_CACHE = False
+RESPONSE_CACHE_PATH = "cache/responses.sqlite"
+RESPONSE_CACHE_MAX_MB = 512
+
+# How movement and vote decisions are made:
+# "generate" samples a free-text answer and matches it against the options,
+# "score" ranks the closed option set by log-probability (one prefill, no decoding).
+DECISION_MODE = "generate"
@@ -0,0 +1,105 @@
+# core/daemon_backend.py
+import itertools
+import json
+import socket
+import threading
+import time
+from config.settings import DAEMON_SOCKET
+from core.llm import MISSED_DEADLINE
+from core.telemetry import MEASUREMENTS, Telemetry
+
+
+class DaemonBackend:
+    """
+    Client for the node-local inference daemon (inference_server.py) over a Unix socket.
+    Model names are "daemon:<model id>", or plain model ids when LLM_BACKEND / --backend is "daemon".
+    The daemon loads each model once per node and batches requests from every game process.
+    Requests are newline-delimited JSON; a batch is pipelined on one connection and answers are matched by id.
+    """
+    def __init__(self, socket_path=DAEMON_SOCKET):
+        self.socket_path = socket_path
+        self.local = threading.local()  # one persistent connection per thread
+        self.ids = itertools.count()
+        self.requests = 0
+
+    def _model_id(self, model_name):
+        return model_name.split(":", 1)[1] if model_name.startswith("daemon:") else model_name
+
+    def _connection(self):
+        if getattr(self.local, "conn", None) is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.socket_path)
+            except OSError as e:
+                raise RuntimeError(f"Inference daemon not reachable at {self.socket_path}: {e}")
+            self.local.conn = conn
+            self.local.reader = conn.makefile("r", encoding="utf-8")
+        return self.local.conn, self.local.reader
+
+    def _call(self, requests):
+        conn, reader = self._connection()
+        for req in requests:
+            req["id"] = next(self.ids)
+        try:
+            conn.sendall("".join(json.dumps(req) + "\n" for req in requests).encode("utf-8"))
+            replies = {}
+            while len(replies) < len(requests):
+                line = reader.readline()
+                if not line:
+                    raise RuntimeError("Inference daemon closed the connection")
+                reply = json.loads(line)
+                replies[reply["id"]] = reply
+        except (OSError, RuntimeError):
+            # Drop the broken connection so the next call reconnects
+            self.local.conn = None
+            raise
+
+        self.requests += len(requests)
+        return [replies[req["id"]] for req in requests]
+
+    def load_model(self, model_name):
+        reply = self._call([{"op": "load", "model": self._model_id(model_name)}])[0]
+        if "error" in reply:
+            raise RuntimeError(f"Daemon failed to load {model_name}: {reply['error']}")
+
+    def generate_batch(self, model_name, prompts):
+        model_id = self._model_id(model_name)
+        start = time.perf_counter()
+        replies = self._call([{"op": "generate", "model": model_id, "prompt": list(prompt)} for prompt in prompts])
+        # Round-trip time split evenly, used when the daemon sends no measurements
+        seconds = (time.perf_counter() - start) / len(prompts) if prompts else 0.0
+
+        responses = []
+        for prompt, reply in zip(prompts, replies):
+            if reply.get("deadline"):
+                # Only this row goes to ModelManager's fallback; the rest of the batch is kept
+                print(f"\n[LLM DEADLINE on {model_name}]: {reply['error']}")
+                responses.append(MISSED_DEADLINE)
+            elif "error" in reply:
+                print(f"\n[LLM ERROR on {model_name}]: {reply['error']}")
+                responses.append(None)  # ModelManager records the failure
+            else:
+                responses.append(reply["result"])
+                # The daemon's own measurements; without them only the round trip is known
+                usage = dict(reply.get("usage") or {"decode_seconds": seconds})
+                measured = [usage.pop(field, None) for field in MEASUREMENTS]
+                usage.setdefault("batch_size", len(prompts))
+                Telemetry.get_instance().record(model_name, prompt, *measured, **usage)
+        return responses
+
+    def score_options(self, model_name, system_prompt, user_prompt, options, agent_name=None):
+        reply = self._call([{
+            "op": "score",
+            "model": self._model_id(model_name),
+            "system": system_prompt,
+            "user": user_prompt,
+            "options": options,
+            "agent_name": agent_name,
+        }])[0]
+        if "error" in reply:
+            print(f"\n[LLM ERROR on {model_name}]: {reply['error']}")
+            return []
+        return [tuple(pair) for pair in reply["result"]]
+
+    def stats(self):
+        return {"requests": self.requests} if self.requests else {}
@@ -0,0 +1,55 @@
+# core/execution.py
+import os
+from config.settings import CPU_THREADS, CPU_WORKERS
+
+
+def available_cpus():
+    """CPUs this process may run on: its affinity mask, capped by the slurm allocation (SLURM_CPUS_PER_TASK)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cpus = os.cpu_count() or 1
+    slurm_cpus = os.environ.get("SLURM_CPUS_PER_TASK")
+    if slurm_cpus and slurm_cpus.isdigit():
+        cpus = min(cpus, int(slurm_cpus))
+    return max(1, cpus)
+
+
+class ExecutionConfig:
+    """
+    CPU thread layout for in-process inference. The CPUs (CPU_THREADS, or the detected allocation) are
+    split between `workers` concurrent single-stream generate calls, each with an intra-op pool of
+    cpus // workers threads, so concurrent streams do not oversubscribe the cores.
+    """
+    def __init__(self, cpus=None, workers=None):
+        self.cpus = cpus or CPU_THREADS or available_cpus()
+        self.workers = max(1, min(workers or CPU_WORKERS, self.cpus))
+        self.threads_per_worker = max(1, self.cpus // self.workers)
+
+    def apply(self):
+        """Uses a single inter-op thread and starts with the whole allocation for one stream."""
+        import torch
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only settable before the first parallel op; keeps the earlier value
+        self.use(1)
+        print(f"CPU execution: {self.cpus} CPUs, up to {self.workers} worker(s) x {self.threads_per_worker} thread(s)")
+
+    def use(self, streams):
+        """
+        Sizes the calling thread's intra-op pool for `streams` concurrent generate calls (cpus // streams
+        threads each). The OpenMP thread count is per thread, so pool workers are sized by init_worker instead.
+        """
+        import torch
+        threads = max(1, self.cpus // max(1, streams))
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+
+    def init_worker(self):
+        """ThreadPoolExecutor initializer: sizes each worker thread's own intra-op pool to threads_per_worker."""
+        import torch
+        torch.set_num_threads(self.threads_per_worker)
+
+    def stats(self):
+        return {"cpus": self.cpus, "workers": self.workers, "threads_per_worker": self.threads_per_worker}
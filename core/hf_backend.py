@@ -0,0 +1,821 @@
+# core/hf_backend.py
+import contextlib
+import copy
+import gc
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, DynamicCache, StoppingCriteria, StoppingCriteriaList
+import logging
+from config.settings import (
+    QUANTIZATION, KV_CACHE, KV_CACHE_MAX_MB, MAX_NEW_TOKENS, DISCUSSION_STOP_WORDS,
+    MODEL_MEMORY_BUDGET_GB, RESIDENCY_OFFLOAD, CPU_DTYPE, CPU_QUANTIZATION, QUANTIZED_CACHE_DIR,
+    CPU_COMPILE, COMPILE_CACHE_DIR, TOKENIZATION_CACHE, CPU_WORKER_MAX_GB, ROOMS
+)
+from core.prefix_cache import PrefixCache
+from core.token_cache import TokenCache
+from core.execution import ExecutionConfig
+from core.llm import check_deadline
+from core.telemetry import Telemetry
+from core.residency import ModelResidency
+
+# Suppress heavy logging
+logging.getLogger("transformers").setLevel(logging.ERROR)
+
+def _kv_cache_nbytes(cache):
+    """Bytes held by the key/value tensors of a cache."""
+    total = 0
+    for layer in cache:
+        for tensor in layer[:2]:
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+def _cpu_dtype():
+    return "auto" if CPU_DTYPE == "auto" else getattr(torch, CPU_DTYPE)
+
+def model_nbytes(model):
+    """Weight bytes of a model. get_memory_footprint() misses the packed int8 weights of dynamically quantized Linear layers."""
+    total = model.get_memory_footprint()
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            weight = module.weight()
+            total += weight.numel() * weight.element_size()
+    return total
+
+def quantized_cache_path(model_name, scheme):
+    return os.path.join(QUANTIZED_CACHE_DIR, f"{model_name.replace('/', '--')}__{scheme}.pt")
+
+def load_quantized_cpu(model_name, scheme):
+    """
+    Returns (model, from_cache) for a CPU model quantized with scheme ("int8_dynamic": int8 weights for every
+    Linear layer, activations quantized on the fly). The quantized model is saved under QUANTIZED_CACHE_DIR
+    the first time, later runs load it from there instead of loading float weights and re-quantizing.
+    """
+    if scheme != "int8_dynamic":
+        raise ValueError(f"Unknown CPU quantization scheme: {scheme}")
+
+    path = quantized_cache_path(model_name, scheme)
+    if os.path.exists(path):
+        try:
+            return torch.load(path, weights_only=False), True
+        except Exception as e:
+            # e.g. written by an incompatible torch/transformers version
+            print(f"Ignoring unreadable quantized checkpoint {path}: {e}")
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name, device_map="cpu", trust_remote_code=True, torch_dtype=torch.float32
+    )
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    os.makedirs(QUANTIZED_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # several games on a node may quantize the same model at once
+    torch.save(model, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Saved quantized {model_name} to {path}")
+    return model, False
+
+def enable_compile_cache():
+    """Persists inductor's compiled kernels and FX graphs under COMPILE_CACHE_DIR, shared by every run on the node."""
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath(COMPILE_CACHE_DIR))
+    torch._inductor.config.fx_graph_cache = True
+
+def cpu_bf16_supported():
+    return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+
+def cpu_autocast(enabled):
+    """bf16 autocast on CPUs with native bf16 support (AVX512-BF16 / AMX), a no-op otherwise."""
+    if enabled and cpu_bf16_supported():
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+def compile_for_cpu(model):
+    """
+    Compiles the model's forward pass with inductor. Shapes are marked dynamic so new prompt lengths
+    and batch sizes reuse the graph instead of recompiling; generate() is then run with a static KV cache.
+    """
+    model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+# Movement-sized prompt used for warm-up and benchmarks
+BENCHMARK_MESSAGES = [
+    {"role": "system", "content": f"You are playing a social deduction game on a spaceship. Map: {ROOMS}"},
+    {"role": "user", "content": "You are in Cafeteria. Adjacent rooms: UpperEngine, MedBay, Weapons, Admin, Storage. Where do you move?"},
+]
+
+def benchmark_generate(model, tokenizer, new_tokens, repeats, **generate_kwargs):
+    """Returns (first call seconds, steady-state tokens/sec) of greedy generation of exactly new_tokens tokens."""
+    input_ids = tokenizer.apply_chat_template(BENCHMARK_MESSAGES, add_generation_prompt=True, return_tensors="pt")
+    kwargs = dict(
+        max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+        pad_token_id=tokenizer.eos_token_id if tokenizer.pad_token_id is None else tokenizer.pad_token_id,
+        **generate_kwargs
+    )
+    with torch.no_grad():
+        start = time.perf_counter()
+        model.generate(input_ids, **kwargs)  # warm-up (includes compilation for compiled models)
+        first_call = time.perf_counter() - start
+
+        if not repeats:
+            return first_call, None
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.generate(input_ids, **kwargs)
+    return first_call, new_tokens * repeats / (time.perf_counter() - start)
+
+class AnswerStoppingCriteria(StoppingCriteria):
+    """
+    Stops each sequence as soon as its reply is usable:
+    - closed-choice calls (movement, vote) once the decoded text contains one of the valid options,
+    - discussion calls at a newline, or at a sentence end once DISCUSSION_STOP_WORDS words are out.
+    """
+    def __init__(self, tokenizer, prompt_len, metas):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.metas = metas
+        self.option_sets = [self._prepare_options(meta.get("options") or []) for meta in metas]
+
+    def _prepare_options(self, options):
+        # An option that is a prefix of another (Agent_1 / Agent_10) only counts once followed by a boundary
+        upper = [o.upper() for o in options]
+        return [(o, any(p != o and p.startswith(o) for p in upper)) for o in upper]
+
+    def _row_done(self, text, options, call_type):
+        if options:
+            upper = text.upper()
+            for option, ambiguous in options:
+                idx = upper.find(option)
+                if idx == -1:
+                    continue
+                end = idx + len(option)
+                if not ambiguous or (end < len(upper) and not (upper[end].isalnum() or upper[end] == "_")):
+                    return True
+            return False
+
+        if call_type == "discussion":
+            stripped = text.strip()
+            if stripped and "\n" in text.lstrip():
+                return True
+            return stripped.endswith((".", "!", "?")) and len(stripped.split()) >= DISCUSSION_STOP_WORDS
+        return False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        for row, meta in enumerate(self.metas):
+            text = self.tokenizer.decode(input_ids[row, self.prompt_len:], skip_special_tokens=True)
+            done.append(self._row_done(text, self.option_sets[row], meta.get("call_type")))
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class DeadlineCriteria(StoppingCriteria):
+    """Cancels generation once the batch's earliest deadline (a time.time() value) has passed."""
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = time.time() > self.deadline
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+
+class FirstTokenTimer(StoppingCriteria):
+    """Never stops generation; notes when the first token is out, which splits a call into prefill and decode."""
+    def __init__(self):
+        self.first = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first is None:
+            self.first = time.perf_counter()
+        return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+
+
+class TransformersBackend:
+    """
+    In-process Hugging Face transformers inference. Default backend for plain model ids.
+    """
+    def __init__(self):
+        self.models = {}
+        self.tokenizers = {}
+        self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.prefix_cache = PrefixCache(KV_CACHE_MAX_MB * 1024 * 1024, _kv_cache_nbytes)
+        self.token_cache = TokenCache()
+        budget = MODEL_MEMORY_BUDGET_GB * 1024**3 if MODEL_MEMORY_BUDGET_GB else None
+        self.residency = ModelResidency(budget)
+        self.offloaded = {}  # model_name -> model parked in CPU RAM after eviction from the GPU
+        self.lock = threading.RLock()  # guards models/offloaded/residency bookkeeping
+        self.load_locks = {}  # model_name -> lock held while that model loads
+        self.load_report = {}  # model_name -> load time and memory breakdown
+        self.throughput = {}  # model_name -> [generated tokens, generate seconds] of padded batches
+
+        # Assisted (speculative) decoding of discussion calls, see set_draft_model()
+        self.draft_models = {}  # target model_name -> draft model_name
+        self.forward_calls = {}  # model_name -> forward passes, counted by a hook on paired models
+        self.forward_hooks = {}  # model_name -> handle of the counting hook on the loaded model object
+        self.speculative = {}  # target model_name -> acceptance counters
+
+        # Compiled CPU path: inductor graphs with a static KV cache, bf16 autocast where the CPU supports it
+        self.compiled = set()
+        if CPU_COMPILE and self._device == "cpu":
+            enable_compile_cache()
+
+        # CPU thread layout from the slurm allocation / affinity mask; small models may run as concurrent streams
+        self.execution = None
+        self.worker_pool = None
+        if self._device == "cpu":
+            self.execution = ExecutionConfig()
+            self.execution.apply()
+            if self.execution.workers > 1:
+                self.worker_pool = ThreadPoolExecutor(max_workers=self.execution.workers,
+                                                      initializer=self.execution.init_worker)
+        self.tokenize_lock = threading.Lock()  # fast tokenizers are not safe to share between threads
+        self.static_prefixes = {}  # (model_name, chat text up to the end of a static system prompt) -> token ids
+        self.special_texts = {}  # model_name -> texts of the tokenizer's added (special) tokens
+
+    def load_model(self, model_name):
+        """
+        Loads a model if it's not already in memory, evicting least recently used models
+        first if it would not fit in MODEL_MEMORY_BUDGET_GB. Marks the model as recently used.
+        Safe to call from several threads; different models load concurrently.
+        """
+        with self.lock:
+            if model_name in self.models:
+                self.residency.touch(model_name)
+                return
+            model_lock = self.load_locks.setdefault(model_name, threading.Lock())
+
+        with model_lock:
+            if model_name not in self.models:  # another thread may have loaded it meanwhile
+                self._load(model_name)
+
+    def _load(self, model_name):
+        start = time.perf_counter()
+        if model_name in self.offloaded:
+            with self.lock:
+                model = self.offloaded.pop(model_name)
+                self.residency.make_room(model.get_memory_footprint(), self._evict)
+            model = model.to(self._device)
+            with self.lock:
+                self.models[model_name] = model
+                self.residency.record_load(model_name, model.get_memory_footprint(), time.perf_counter() - start)
+            print(f"Model {model_name} restored from CPU RAM.")
+            return
+
+        if self.residency.budget_bytes is not None:
+            estimate = self._estimate_footprint(model_name)
+            with self.lock:
+                self.residency.make_room(estimate, self._evict)
+                # Hold the space while loading so concurrent loads see it as taken
+                self.residency.reserve(model_name, estimate)
+
+        print(f"Loading Model: {model_name} on {self._device}...")
+        
+        try:
+            tokenizer = self.load_tokenizer(model_name)
+            tokenizer_seconds = time.perf_counter() - start
+            quantized_from_cache = False
+            if self._device == "cpu" and CPU_QUANTIZATION:
+                model, quantized_from_cache = load_quantized_cpu(model_name, CPU_QUANTIZATION)
+            else:
+                quantization_config = None
+                if QUANTIZATION and self._device == "cuda":
+                    quantization_config = BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_compute_dtype=torch.float16
+                    )
+
+                # device_map places weights directly on the target device (no second copy via .to()).
+                # safetensors checkpoints are memory-mapped; when the load dtype matches the checkpoint
+                # (CPU_DTYPE = "auto"), tensors are used without conversion.
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_name,
+                    quantization_config=quantization_config,
+                    device_map="auto",
+                    trust_remote_code=True,
+                    torch_dtype=torch.bfloat16 if self._device == "cuda" else _cpu_dtype(),
+                )
+
+            warmup_seconds = None
+            if CPU_COMPILE and self._device == "cpu":
+                warmup_start = time.perf_counter()
+                compile_for_cpu(model)
+                with cpu_autocast(True):
+                    benchmark_generate(model, tokenizer, new_tokens=4, repeats=0, cache_implementation="static")
+                warmup_seconds = time.perf_counter() - warmup_start
+                self.compiled.add(model_name)
+
+        except Exception as e:
+            with self.lock:
+                self.residency.release(model_name)
+            print(f"Error loading model {model_name}: {e}")
+            raise e
+
+        seconds = time.perf_counter() - start - (warmup_seconds or 0.0)
+        with self.lock:
+            self.models[model_name] = model
+            self.tokenizers[model_name] = tokenizer
+            self.residency.record_load(model_name, model_nbytes(model), seconds)
+
+        self.load_report[model_name] = {
+            "seconds": round(seconds, 1),
+            "tokenizer_seconds": round(tokenizer_seconds, 1),
+            "weights_seconds": round(seconds - tokenizer_seconds, 1),
+            "footprint_gb": round(model_nbytes(model) / 1024**3, 2),
+            "quantization": CPU_QUANTIZATION if self._device == "cpu" and CPU_QUANTIZATION else (
+                "bnb_4bit" if QUANTIZATION and self._device == "cuda" else None),
+            "quantized_from_cache": quantized_from_cache,
+            # Compilation and first-call cost; much lower once COMPILE_CACHE_DIR is warm
+            "compile_warmup_seconds": round(warmup_seconds, 1) if warmup_seconds is not None else None,
+            # Process-wide peaks: with concurrent loads they cover every model loaded so far
+            "peak_rss_gb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**2, 2),
+            "peak_vram_gb": round(torch.cuda.max_memory_allocated() / 1024**3, 2) if self._device == "cuda" else 0.0,
+        }
+        print(f"Model {model_name} loaded successfully in {seconds:.1f}s.")
+
+    def _estimate_footprint(self, model_name):
+        """Weight bytes model_name will take at its load dtype/quantization, counted on an empty (meta) skeleton."""
+        from accelerate import init_empty_weights
+        config = AutoConfig.from_pretrained(model_name, trust_remote_code=True)
+        with init_empty_weights():
+            skeleton = AutoModelForCausalLM.from_config(config, trust_remote_code=True)
+        n_params = sum(p.numel() for p in skeleton.parameters())
+        if self._device == "cuda":
+            bytes_per_param = 0.5 if QUANTIZATION else 2
+        elif CPU_QUANTIZATION:
+            bytes_per_param = 1
+        else:
+            bytes_per_param = 2 if CPU_DTYPE in ("auto", "bfloat16", "float16") else 4
+        return int(n_params * bytes_per_param)
+
+    def _evict(self, model_name):
+        """Frees a model's device memory: parks it in CPU RAM when possible, otherwise drops it."""
+        model = self.models.pop(model_name, None)
+        self.prefix_cache.drop_model(model_name)
+        # The reloaded (or restored) model gets a fresh counting hook
+        hook = self.forward_hooks.pop(model_name, None)
+        if hook is not None:
+            hook.remove()
+        self.forward_calls.pop(model_name, None)
+        if model is None:
+            return
+        # 4-bit bitsandbytes weights cannot be moved off the GPU, those are dropped and reloaded
+        if RESIDENCY_OFFLOAD and self._device == "cuda" and not getattr(model, "is_quantized", False):
+            self.offloaded[model_name] = model.to("cpu")
+        del model
+        gc.collect()
+        if self._device == "cuda":
+            torch.cuda.empty_cache()
+
+    def generate_batch(self, model_name, prompts):
+        """
+        Generates responses for several prompts on the same model.
+        prompts: list of (system_prompt, user_prompt, temperature) tuples, optionally followed by
+        a dict of per-request metadata ({"agent_name", "call_type", "options"}, see ModelManager.generate()).
+        Prompts sharing a temperature are left-padded and run in a single model.generate call.
+        With KV_CACHE enabled, requests from a named agent are served one at a time from the prefix cache.
+        Discussion calls on a model with a draft model are decoded one at a time with assisted generation.
+        Returns the responses in the same order as the prompts. Raises if generation fails
+        (ModelManager splits the batch or shortens the prompt and retries).
+        """
+        if not prompts:
+            return []
+
+        # Ensure model is loaded (lazy load safety, reloads it if it was evicted)
+        self.load_model(model_name)
+
+        responses = [None] * len(prompts)
+
+        # Sampling temperature is per generate call, so group prompts by it
+        groups = {}
+        for i, prompt in enumerate(prompts):
+            temperature = prompt[2]
+            meta = prompt[3] if len(prompt) > 3 else {}
+            if meta.get("call_type") == "discussion" and model_name in self.draft_models:
+                responses[i] = self._generate_assisted(model_name, prompt)
+            elif KV_CACHE and meta.get("agent_name"):
+                responses[i] = self._generate_cached(model_name, prompt)
+            else:
+                groups.setdefault(temperature, []).append(i)
+
+        for temperature, indices in groups.items():
+            batch = [prompts[i] for i in indices]
+            for i, response in zip(indices, self._generate_group(model_name, batch, temperature)):
+                responses[i] = response
+        return responses
+
+    def _generate_group(self, model_name, batch, temperature):
+        """
+        Prompts sharing a temperature run as one padded batch on all CPU threads (or the GPU). On CPU, small
+        models (footprint up to CPU_WORKER_MAX_GB) instead run up to CPU_WORKERS concurrent single-stream
+        calls, each on its share of the threads, which avoids padding and one oversubscribed stream.
+        """
+        streams = 1
+        if self.worker_pool is not None and len(batch) > 1:
+            if self.load_report.get(model_name, {}).get("footprint_gb", float("inf")) <= CPU_WORKER_MAX_GB:
+                streams = min(self.execution.workers, len(batch))
+        if streams == 1:
+            if self.execution is not None:
+                self.execution.use(1)
+            return self._generate_padded(model_name, batch, temperature)
+        # Worker threads run on threads_per_worker threads each (ExecutionConfig.init_worker)
+        return list(self.worker_pool.map(
+            lambda prompt: self._generate_padded(model_name, [prompt], temperature)[0], batch
+        ))
+
+    def load_tokenizer(self, model_name):
+        """
+        The model's tokenizer, loaded on its own if the model is not loaded yet. Tokenizers are small and
+        never evicted, so prompt-budget token counts never load, reload or mark the weights as used.
+        """
+        with self.lock:
+            tokenizer = self.tokenizers.get(model_name)
+        if tokenizer is None:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            # Ensure pad token is set
+            if tokenizer.pad_token_id is None:
+                tokenizer.pad_token_id = tokenizer.eos_token_id
+            with self.lock:
+                tokenizer = self.tokenizers.setdefault(model_name, tokenizer)
+        return tokenizer
+
+    def count_tokens(self, model_name, text, key=None):
+        self.load_tokenizer(model_name)
+        return len(self._encode(model_name, text, key))
+
+    def _encode(self, model_name, text, key=None):
+        """
+        Token ids of text without special tokens. key names a stream (agent and call type, log section)
+        whose previous tokenization is reused up to where the text changed, when TOKENIZATION_CACHE is on.
+        """
+        key = (model_name, key) if TOKENIZATION_CACHE and key else None
+        with self.tokenize_lock:
+            return self.token_cache.encode(self.tokenizers[model_name], key, text)
+
+    def _encode_prompt(self, model_name, prompt):
+        """
+        Chat-formatted token ids of a prompt and how many of them are its static prefix (0 if none).
+        With meta["static_system"], the chat text up to the end of the system prompt is tokenized once per
+        model and system prompt. The split is only made right before a special token, where it cannot
+        change the tokenization.
+        """
+        tokenizer = self.tokenizers[model_name]
+        system_prompt, user_prompt = prompt[0], prompt[1]
+        meta = prompt[3] if len(prompt) > 3 else {}
+        text = self._chat_text(tokenizer, system_prompt, user_prompt)
+        key = self._stream_key(prompt)
+
+        system = system_prompt.strip()
+        end = text.find(system) if meta.get("static_system") and system else -1
+        if end >= 0:
+            end += len(system)
+            if model_name not in self.special_texts:
+                self.special_texts[model_name] = tuple(tokenizer.get_added_vocab())
+            if not text.startswith(self.special_texts[model_name], end):
+                end = -1
+        if end < 0:
+            return self._encode(model_name, text, key), 0
+
+        static_key = (model_name, text[:end])
+        static_ids = self.static_prefixes.get(static_key)
+        if static_ids is None:
+            static_ids = self._encode(model_name, text[:end])
+            self.static_prefixes[static_key] = static_ids
+        return static_ids + self._encode(model_name, text[end:], key), len(static_ids)
+
+    def _pin_static_prefix(self, model_name, token_ids, static_len, cache):
+        """Keeps a copy of a static prefix's KV state in the prefix cache, exempt from eviction, once per prefix."""
+        key = (model_name, ("static", tuple(token_ids[:static_len])))
+        if key in self.prefix_cache:
+            return
+        pinned = copy.deepcopy(cache)
+        pinned.crop(static_len)
+        self.prefix_cache.put(key, token_ids[:static_len], pinned, pinned=True)
+
+    def _stream_key(self, prompt):
+        meta = prompt[3] if len(prompt) > 3 else {}
+        return (meta["agent_name"], meta.get("call_type")) if meta.get("agent_name") else None
+
+    def _chat_text(self, tokenizer, system_prompt, user_prompt):
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        return tokenizer.apply_chat_template(
+            messages,
+            add_generation_prompt=True,
+            tokenize=False
+        )
+
+    def _decoding_kwargs(self, tokenizer, prompt_len, batch, timer=None):
+        """
+        Token budget and early-stop criteria for a batch; the budget is the largest of its call types.
+        Generation is also cut off at the batch's earliest deadline (callers then raise DeadlineExceeded).
+        timer (a FirstTokenTimer) is run with the criteria to time the prefill.
+        """
+        metas = [prompt[3] if len(prompt) > 3 else {} for prompt in batch]
+        budget = max(MAX_NEW_TOKENS.get(meta.get("call_type"), MAX_NEW_TOKENS["default"]) for meta in metas)
+        criteria = [AnswerStoppingCriteria(tokenizer, prompt_len, metas)]
+        deadlines = [meta["deadline"] for meta in metas if meta.get("deadline") is not None]
+        if deadlines:
+            criteria.append(DeadlineCriteria(min(deadlines)))
+        if timer is not None:
+            criteria.append(timer)
+        return {
+            "max_new_tokens": budget,
+            "stopping_criteria": StoppingCriteriaList(criteria),
+        }
+
+    def _record_telemetry(self, model_name, batch, prompt_tokens, new_tokens, start, timer, **extra):
+        """Records each row of a finished generate call; rows share the call's prefill and decode time evenly."""
+        end = time.perf_counter()
+        first = timer.first if timer.first is not None else end
+        share = 1.0 / len(batch)
+        telemetry = Telemetry.get_instance()
+        for prompt, prompt_len, new_len in zip(batch, prompt_tokens, new_tokens):
+            telemetry.record(model_name, prompt, prompt_len, new_len, (first - start) * share, (end - first) * share,
+                             batch_size=len(batch), **extra)
+
+    def _free_after_failure(self):
+        """Releases what a failed generate call left behind (e.g. after an OOM) before ModelManager retries."""
+        gc.collect()
+        if self._device == "cuda":
+            torch.cuda.empty_cache()
+
+    def set_draft_model(self, model_name, draft_name):
+        """
+        Pairs a target model with a smaller draft model of the same tokenizer family (e.g. Llama 3.1 70B
+        with Llama 3.2 1B). Discussion calls on the target then use assisted generation: the draft proposes
+        tokens and the target verifies them in one forward pass, with the same output distribution.
+        """
+        self.draft_models[model_name] = draft_name
+
+    def _count_forwards(self, model_name):
+        """
+        Installs (once per loaded model object, see _evict) a forward hook counting model_name's forward
+        passes; returns the count so far.
+        """
+        if model_name not in self.forward_hooks:
+            self.forward_calls[model_name] = 0
+
+            def hook(module, args, output):
+                self.forward_calls[model_name] += 1
+
+            self.forward_hooks[model_name] = self.models[model_name].register_forward_hook(hook)
+        return self.forward_calls[model_name]
+
+    def _generate_assisted(self, model_name, prompt):
+        """
+        Generates a single response with the target's draft model proposing tokens.
+        Forward passes of both models are counted to track how many drafted tokens the target accepts.
+        """
+        draft_name = self.draft_models[model_name]
+        self.load_model(draft_name)
+        self.load_model(model_name)  # loading the draft may have evicted the target
+        model, draft = self.models[model_name], self.models[draft_name]
+        tokenizer = self.tokenizers[model_name]
+
+        if len(tokenizer) != len(self.tokenizers[draft_name]):
+            print(f"Draft model {draft_name} does not share {model_name}'s tokenizer; assisted decoding disabled.")
+            del self.draft_models[model_name]
+            return self.generate_batch(model_name, [prompt])[0]
+
+        temperature = prompt[2]
+        try:
+            input_ids = torch.tensor([self._encode_prompt(model_name, prompt)[0]], device=self._device)
+
+            target_before, draft_before = self._count_forwards(model_name), self._count_forwards(draft_name)
+            timer = FirstTokenTimer()
+            start = time.perf_counter()
+            with torch.no_grad():
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    assistant_model=draft,
+                    do_sample=True,
+                    temperature=temperature,
+                    eos_token_id=tokenizer.eos_token_id,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **self._decoding_kwargs(tokenizer, input_ids.shape[1], [prompt], timer)
+                )
+            self._record_telemetry(model_name, [prompt], [input_ids.shape[1]], [outputs.shape[1] - input_ids.shape[1]],
+                                   start, timer, draft=draft_name)
+
+            # Every target pass keeps the accepted drafted tokens plus one token of its own
+            new_tokens = outputs.shape[1] - input_ids.shape[1]
+            counters = self.speculative.setdefault(
+                model_name, {"calls": 0, "new_tokens": 0, "target_forwards": 0, "drafted": 0, "seconds": 0.0}
+            )
+            counters["calls"] += 1
+            counters["new_tokens"] += new_tokens
+            counters["target_forwards"] += self._count_forwards(model_name) - target_before
+            counters["drafted"] += self._count_forwards(draft_name) - draft_before
+            counters["seconds"] += time.perf_counter() - start
+            check_deadline([prompt])
+
+            return tokenizer.decode(outputs[0][input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+        except Exception:
+            self._free_after_failure()
+            raise
+
+    def _generate_cached(self, model_name, prompt):
+        """
+        Generates a single response, prefilling only the tokens past the longest cached prefix.
+        The prefix may come from this agent's last call or from any other agent on the same model.
+        """
+        model = self.models[model_name]
+        tokenizer = self.tokenizers[model_name]
+        temperature, meta = prompt[2], prompt[3]
+
+        try:
+            token_ids, static_len = self._encode_prompt(model_name, prompt)
+            input_ids = torch.tensor([token_ids], device=self._device)
+
+            key = (model_name, meta["agent_name"])
+            cache, prefix_len = self.prefix_cache.take(key, token_ids)
+            if cache is None:
+                cache = DynamicCache()
+            else:
+                # Drop everything past the shared prefix; generate() prefills the rest
+                cache.crop(prefix_len)
+
+            timer = FirstTokenTimer()
+            start = time.perf_counter()
+            with torch.no_grad():
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=cache,
+                    do_sample=True,
+                    temperature=temperature,
+                    eos_token_id=tokenizer.eos_token_id,
+                    pad_token_id=tokenizer.pad_token_id,
+                    return_dict_in_generate=True,
+                    **self._decoding_kwargs(tokenizer, len(token_ids), [prompt], timer)
+                )
+            self._record_telemetry(model_name, [prompt], [len(token_ids)], [outputs.sequences.shape[1] - len(token_ids)],
+                                   start, timer, cached_tokens=prefix_len)
+
+            # Keep the prompt's KV state only; the sampled reply is not part of the next prompt
+            cache = outputs.past_key_values
+            cache.crop(len(token_ids))
+            if static_len:
+                self._pin_static_prefix(model_name, token_ids, static_len, cache)
+            self.prefix_cache.put(key, token_ids, cache)
+            check_deadline([prompt])
+
+            response = outputs.sequences[0][len(token_ids):]
+            return tokenizer.decode(response, skip_special_tokens=True).strip()
+
+        except Exception:
+            self._free_after_failure()
+            raise
+
+    def score_options(self, model_name, system_prompt, user_prompt, options, agent_name=None):
+        """
+        Ranks a closed set of answers by the log-probability of each option's tokens following the prompt.
+        The prompt is prefilled once; all options are then scored together in one forward pass over its KV state.
+        Returns list of (option, logprob) sorted best first, or an empty list if scoring failed.
+        """
+        self.load_model(model_name)
+
+        model = self.models[model_name]
+        tokenizer = self.tokenizers[model_name]
+
+        try:
+            text = self._chat_text(tokenizer, system_prompt, user_prompt)
+            token_ids = self._encode(model_name, text, (agent_name, "score") if agent_name else None)
+            input_ids = torch.tensor([token_ids], device=self._device)
+
+            # 1. Prefill the prompt once (from the prefix cache when enabled)
+            key = (model_name, agent_name)
+            cache, prefix_len = (None, 0)
+            if KV_CACHE and agent_name:
+                cache, prefix_len = self.prefix_cache.take(key, token_ids)
+                if cache is not None:
+                    cache.crop(prefix_len)
+            if cache is None:
+                cache = DynamicCache()
+
+            start = time.perf_counter()
+            with torch.no_grad():
+                prefill = model(input_ids=input_ids[:, prefix_len:], past_key_values=cache, use_cache=True)
+            cache = prefill.past_key_values
+            first_logprobs = torch.log_softmax(prefill.logits[0, -1].float(), dim=-1)
+            prefill_seconds = time.perf_counter() - start
+
+            if KV_CACHE and agent_name:
+                self.prefix_cache.put(key, token_ids, cache)
+                cache = copy.deepcopy(cache)
+
+            # 2. Score every option against a copy of the prompt state per row.
+            # Options are right-padded; padding only follows real tokens, so causal attention ignores it.
+            option_ids = [tokenizer(opt, add_special_tokens=False)["input_ids"] for opt in options]
+            max_len = max(len(ids) for ids in option_ids)
+            rows = [ids + [tokenizer.pad_token_id] * (max_len - len(ids)) for ids in option_ids]
+            batch = torch.tensor(rows, device=self._device)
+
+            cache.batch_repeat_interleave(len(options))
+            with torch.no_grad():
+                logits = model(input_ids=batch, past_key_values=cache, use_cache=False).logits
+            logprobs = torch.log_softmax(logits.float(), dim=-1)
+
+            scores = []
+            for row, ids in enumerate(option_ids):
+                total = first_logprobs[ids[0]].item()
+                for j in range(1, len(ids)):
+                    total += logprobs[row, j - 1, ids[j]].item()
+                scores.append((options[row], total))
+
+            # Scoring generates nothing; its "decode" is the one pass over the options
+            meta = {"agent_name": agent_name, "call_type": None}
+            Telemetry.get_instance().record(
+                model_name, (system_prompt, user_prompt, 0.0, meta), len(token_ids), 0, prefill_seconds,
+                time.perf_counter() - start - prefill_seconds, cached_tokens=prefix_len, options=len(options)
+            )
+
+            return sorted(scores, key=lambda x: x[1], reverse=True)
+
+        except Exception as e:
+            print(f"\n[LLM ERROR on {model_name}]: {e}")
+            return []
+
+    def _generate_padded(self, model_name, batch, temperature):
+        model = self.models[model_name]
+        tokenizer = self.tokenizers[model_name]
+
+        try:
+            rows = [self._encode_prompt(model_name, prompt)[0] for prompt in batch]
+
+            # Left padding keeps every prompt flush against its first generated token
+            input_len = max(len(ids) for ids in rows)
+            inputs = {
+                "input_ids": torch.tensor(
+                    [[tokenizer.pad_token_id] * (input_len - len(ids)) + ids for ids in rows], device=self._device
+                ),
+                "attention_mask": torch.tensor(
+                    [[0] * (input_len - len(ids)) + [1] * len(ids) for ids in rows], device=self._device
+                ),
+            }
+
+            compiled = model_name in self.compiled
+            extra = {"cache_implementation": "static"} if compiled else {}
+            timer = FirstTokenTimer()
+            start = time.perf_counter()
+            with torch.no_grad(), cpu_autocast(compiled):
+                outputs = model.generate(
+                    input_ids=inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    do_sample=True,
+                    temperature=temperature,
+                    eos_token_id=tokenizer.eos_token_id,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **self._decoding_kwargs(tokenizer, input_len, batch, timer),
+                    **extra
+                )
+            new_tokens = (outputs[:, input_len:] != tokenizer.pad_token_id).sum(dim=1).tolist()
+            counters = self.throughput.setdefault(model_name, [0, 0.0])
+            counters[0] += sum(new_tokens)
+            counters[1] += time.perf_counter() - start
+            self._record_telemetry(model_name, batch, [len(ids) for ids in rows], new_tokens, start, timer)
+            check_deadline(batch)
+
+            return [
+                tokenizer.decode(output[input_len:], skip_special_tokens=True).strip()
+                for output in outputs
+            ]
+            
+        except Exception:
+            self._free_after_failure()
+            raise
+
+    def stats(self):
+        stats = {"residency": self.residency.stats()} if self.residency.loads else {}
+        if self.load_report:
+            stats["loads"] = self.load_report
+        if self.throughput:
+            stats["throughput"] = {
+                name: {
+                    "mode": "compiled" if name in self.compiled else "eager",
+                    "tokens_per_sec": round(tokens / seconds, 1) if seconds else 0.0,
+                }
+                for name, (tokens, seconds) in self.throughput.items()
+            }
+        if self.speculative:
+            stats["speculative"] = {
+                name: {
+                    "draft": self.draft_models.get(name),
+                    "calls": c["calls"],
+                    "acceptance_rate": round((c["new_tokens"] - c["target_forwards"]) / c["drafted"], 3) if c["drafted"] else 0.0,
+                    "tokens_per_target_forward": round(c["new_tokens"] / c["target_forwards"], 2) if c["target_forwards"] else 0.0,
+                    "seconds_per_call": round(c["seconds"] / c["calls"], 2),
+                }
+                for name, c in self.speculative.items()
+            }
+        if KV_CACHE:
+            stats["prefix_cache"] = self.prefix_cache.stats()
+        if self.token_cache.calls:
+            stats["tokenization"] = self.token_cache.stats()
+        if self.execution is not None:
+            stats["execution"] = self.execution.stats()
+        return stats
@@ -1,19 +1,91 @@
 # core/llm.py
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-import logging
-from config.settings import QUANTIZATION
+import importlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    LLM_BACKEND, RESPONSE_CACHE, RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB, PRELOAD_WORKERS,
+    LLM_MAX_BATCH, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, LLM_BATCH_RECOVERY, LLM_DEADLINES
+)
+from core.response_cache import ResponseCache, request_key
+from core.prompt_builder import PromptBuilder
+
+# Backend registry. A model name of the form "<backend>:<spec>" (e.g. "stub:random") is served by that
+# backend; anything else is a Hugging Face model id served by the default backend (LLM_BACKEND).
+# Entries are classes or "module.Class" paths, imported on first use so torch is only loaded when needed.
+BACKENDS = {
+    "transformers": "core.hf_backend.TransformersBackend",
+    "stub": "core.stub_backend.StubBackend",
+    "openai": "core.openai_backend.OpenAIBackend",
+    "daemon": "core.daemon_backend.DaemonBackend",
+}
+DEFAULT_BACKEND = LLM_BACKEND
+
+
+def register_backend(name, backend):
+    """Registers a backend class (or "module.Class" path) for model names prefixed with '<name>:'."""
+    BACKENDS[name] = backend
+
+
+def set_default_backend(name):
+    """Routes plain model ids to another backend (e.g. "daemon" to share a node-local inference server)."""
+    global DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    DEFAULT_BACKEND = name
+
+
+def backend_name_for(model_name):
+    prefix = model_name.split(":", 1)[0]
+    return prefix if ":" in model_name and prefix in BACKENDS else DEFAULT_BACKEND
+
+
+class DeadlineExceeded(Exception):
+    """Raised by a backend when a request ran past its deadline (meta["deadline"], a time.time() value)."""
+
+
+# Answer a backend returns for a row that missed its deadline while the rest of its batch completed
+MISSED_DEADLINE = object()
+
+
+def check_deadline(prompts):
+    """Raises DeadlineExceeded if any of the prompts' deadlines has passed."""
+    now = time.time()
+    for prompt in prompts:
+        deadline = prompt[3].get("deadline") if len(prompt) > 3 else None
+        if deadline is not None and now > deadline:
+            raise DeadlineExceeded(f"{now - deadline:.1f}s past the deadline")
+
+
+def default_response(prompt):
+    """Cheap answer for a request that missed its deadline: stay put, skip the vote, pass in discussion."""
+    meta = prompt[3] if len(prompt) > 3 else {}
+    if meta.get("call_type") == "vote":
+        return "SKIP"
+    if meta.get("options"):
+        return meta["options"][0]  # movement options start with the current room
+    return "I have nothing new to add this round."
 
-# Suppress heavy logging
-logging.getLogger("transformers").setLevel(logging.ERROR)
 
 class ModelManager:
     _instance = None
-    
+
     def __init__(self):
-        self.models = {}
-        self.tokenizers = {}
-        self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backends = {}
+        self.backends_lock = threading.Lock()
+        self.seed = None  # scenario seed, part of every response cache key; None bypasses the cache
+        self.response_cache = None
+        if RESPONSE_CACHE:
+            self.response_cache = ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+        self.prompt_builder = PromptBuilder(self.count_tokens)
+
+        # Inference failure handling (see generate_batch)
+        self.batch_limits = {}  # model_name -> max prompts per backend batch, lowered after failed batches
+        self.batch_successes = {}  # model_name -> full-size batches since the limit last changed
+        self.failure_counts = {"llm_failures": 0, "llm_retries": 0, "batch_splits": 0, "llm_fallbacks": 0}
+        self.agent_counters = {}  # agent_name -> {"llm_failures": n, "llm_retries": n, "llm_fallbacks": n}
+        self.fallback_models = {}  # model_name -> faster model answering its requests that miss a deadline
 
     @classmethod
     def get_instance(cls):
@@ -21,85 +93,266 @@ class ModelManager:
             cls._instance = cls()
         return cls._instance
 
+    def backend_for(self, model_name):
+        """Returns the (lazily created) backend instance serving model_name."""
+        name = backend_name_for(model_name)
+        with self.backends_lock:
+            if name not in self.backends:
+                backend = BACKENDS[name]
+                if isinstance(backend, str):
+                    module_path, class_name = backend.rsplit(".", 1)
+                    backend = getattr(importlib.import_module(module_path), class_name)
+                self.backends[name] = backend()
+            return self.backends[name]
+
     def load_model(self, model_name):
         """
         Loads a model if it's not already in memory.
         """
-        if model_name in self.models:
-            return
+        self.backend_for(model_name).load_model(model_name)
 
-        print(f"Loading Model: {model_name} on {self._device}...")
-        
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            if QUANTIZATION and self._device == "cuda":
-                quantization_config = BitsAndBytesConfig(
-                    load_in_4bit=True,
-                    bnb_4bit_compute_dtype=torch.float16
-                )
-
-            model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                quantization_config=quantization_config,
-                device_map="auto",
-                trust_remote_code=True,
-                torch_dtype=torch.bfloat16 if self._device == "cuda" else torch.float32,
-            )
-            
-            model.to(self._device)
-            
-            # Ensure pad token is set
-            if tokenizer.pad_token_id is None:
-                tokenizer.pad_token_id = tokenizer.eos_token_id
-                
-            self.models[model_name] = model
-            self.tokenizers[model_name] = tokenizer
-            print(f"Model {model_name} loaded successfully.")
-            
-        except Exception as e:
-            print(f"Error loading model {model_name}: {e}")
-            raise e
+    def configure(self, composition):
+        """
+        Applies a composition's per-model serving options.
+        "draft_models" maps a target model to a draft model sharing its tokenizer; discussion calls on
+        the target then use assisted (speculative) decoding where the backend supports it.
+        "fallback_models" maps a model to a faster one that answers its requests which miss their
+        LLM_DEADLINES deadline; models without one fall back to default_response().
+        """
+        self.fallback_models = dict(composition.get("fallback_models", {}))
+        for target, draft in composition.get("draft_models", {}).items():
+            backend = self.backend_for(target)
+            if hasattr(backend, "set_draft_model") and backend is self.backend_for(draft):
+                backend.set_draft_model(target, draft)
+            else:
+                print(f"Draft model {draft} for {target} ignored: not supported by its backend")
+
+    def preload(self, model_names):
+        """
+        Loads several models concurrently (PRELOAD_WORKERS threads). Weight loading is mostly
+        disk and memory-copy bound, so overlapping the models of a composition shortens startup.
+        Returns the wall-clock seconds taken.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(PRELOAD_WORKERS, len(model_names)))) as pool:
+            # list() re-raises the first load error
+            list(pool.map(self.load_model, model_names))
+        return time.perf_counter() - start
 
-    def generate(self, model_name, system_prompt, user_prompt, temperature=0.1):
+    def count_tokens(self, model_name, text, key=None):
+        """
+        Prompt tokens of text with the model's tokenizer; about 4 chars per token if the backend has none.
+        key names an append-only stream (e.g. an agent's log section) so its tokenization can be reused.
+        """
+        backend = self.backend_for(model_name)
+        if hasattr(backend, "count_tokens"):
+            return backend.count_tokens(model_name, text, key)
+        return len(text) // 4
+
+    def generate(self, model_name, system_prompt, user_prompt, temperature=0.1, agent_name=None, call_type=None, options=None,
+                 static_system=False):
         """
         Generates response using the specified model.
+        agent_name keys this call's entry in the shared prefix cache.
+        call_type ("movement", "vote", "discussion") selects the decoding budget in MAX_NEW_TOKENS,
+        and options (valid answers of a closed-choice call) let decoding stop as soon as one appears.
+        static_system marks the system prompt as identical on every call of this agent, so backends may keep
+        its tokenization and KV state.
         """
-        # Ensure model is loaded (lazy load safety)
-        if model_name not in self.models:
-            self.load_model(model_name)
+        meta = {"agent_name": agent_name, "call_type": call_type, "options": options, "static_system": static_system}
+        return self.generate_batch(model_name, [(system_prompt, user_prompt, temperature, meta)])[0]
+
+    def generate_batch(self, model_name, prompts, on_failure="", on_deadline=None):
+        """
+        Generates responses for several prompts on the same model.
+        prompts: list of (system_prompt, user_prompt, temperature) tuples, optionally followed by
+        a dict of per-request metadata ({"agent_name", "call_type", "options", "static_system"}, see generate()).
+        With RESPONSE_CACHE enabled and a scenario seed set, previously seen requests are answered
+        from disk and only the misses reach the backend.
+        Failed batches are split and failed requests retried with a shorter prompt (see _generate_chunk);
+        requests that still fail get on_failure and are counted in agent_counters, never cached.
+        Requests that miss their deadline are answered by _fallback, or get on_deadline when it is given
+        (the inference daemon passes a marker so the game process applies its own fallback).
+        Returns the responses in the same order as the prompts.
+        """
+        if not prompts:
+            return []
+        backend = self.backend_for(model_name)
+
+        keys = [None] * len(prompts)
+        responses = [None] * len(prompts)
+        if self._caching():
+            keys = [self._generate_key(model_name, prompt) for prompt in prompts]
+            responses = [self.response_cache.get(key) for key in keys]
 
-        model = self.models[model_name]
-        tokenizer = self.tokenizers[model_name]
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            limit = self.batch_limits.get(model_name, LLM_MAX_BATCH)
+            fresh, timed_out = [], []
+            for start in range(0, len(missing), limit):
+                chunk = missing[start:start + limit]
+                try:
+                    fresh += self._generate_chunk(backend, model_name, [self._with_deadline(prompts[i]) for i in chunk], 0)
+                except DeadlineExceeded as e:
+                    print(f"\n[LLM DEADLINE on {model_name}] batch of {len(chunk)}: {e}")
+                    timed_out += chunk
+                    fresh += [None] * len(chunk)
+            timed_out += [i for i, response in zip(missing, fresh) if response is MISSED_DEADLINE]
 
+            for i, response in zip(missing, fresh):
+                if i in timed_out:
+                    continue
+                if response is None:
+                    self._record(prompts[i], "llm_failures")
+                    responses[i] = on_failure
+                    continue
+                responses[i] = response
+                if keys[i] is not None:
+                    self.response_cache.put(keys[i], model_name, response)
+
+            if timed_out and on_deadline is not None:
+                for i in timed_out:
+                    responses[i] = on_deadline
+            # Fallback answers are not cached under this model
+            elif timed_out:
+                for i, response in zip(timed_out, self._fallback(model_name, [prompts[i] for i in timed_out])):
+                    self._record(prompts[i], "llm_fallbacks")
+                    responses[i] = response
+        return responses
+
+    def _with_deadline(self, prompt):
+        """Stamps the request with its call type's LLM_DEADLINES deadline, unless it already has one (or None)."""
+        meta = prompt[3] if len(prompt) > 3 else {}
+        seconds = (LLM_DEADLINES or {}).get(meta.get("call_type"))
+        if "deadline" in meta or not seconds:
+            return prompt
+        return tuple(prompt[:3]) + (dict(meta, deadline=time.time() + seconds),)
+
+    def _fallback(self, model_name, prompts):
+        """Answers requests that missed their deadline with the model's fallback model, or default_response()."""
+        fallback = self.fallback_models.get(model_name)
+        if not fallback or fallback == model_name:
+            return [default_response(prompt) for prompt in prompts]
+        print(f"Rerouting {len(prompts)} request(s) from {model_name} to {fallback}")
+        # Without a deadline, so the fallback always answers
+        return self.generate_batch(fallback, [
+            tuple(prompt[:3]) + (dict(prompt[3] if len(prompt) > 3 else {}, deadline=None),) for prompt in prompts
+        ])
+
+    def _generate_chunk(self, backend, model_name, prompts, depth):
+        """
+        Runs one backend batch. If the whole batch fails (e.g. out of memory), the model's batch limit
+        drops to half the failed size and each half is retried after a backoff. Single requests that
+        fail are retried with a shortened prompt. Returns responses, None where they still failed
+        and MISSED_DEADLINE where the backend reported a row past its deadline.
+        """
+        check_deadline(prompts)
         try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-            
-            inputs = tokenizer.apply_chat_template(
-                messages,
-                add_generation_prompt=True,
-                return_tensors="pt"
-            ).to(self._device)
-
-            attention_mask = torch.ones_like(inputs).to(self._device)
-
-            with torch.no_grad():
-                outputs = model.generate(
-                    input_ids=inputs,
-                    attention_mask=attention_mask,
-                    max_new_tokens=60,
-                    do_sample=True,
-                    temperature=temperature,
-                    eos_token_id=tokenizer.eos_token_id,
-                    pad_token_id=tokenizer.pad_token_id
-                )
-
-            input_len = inputs.shape[1]
-            response = outputs[0][input_len:]
-            return tokenizer.decode(response, skip_special_tokens=True).strip()
-            
+            responses = backend.generate_batch(model_name, prompts)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"\n[LLM ERROR on {model_name}]: {e}")
-            return "move" # Fail-safe
\ No newline at end of file
+            print(f"\n[LLM ERROR on {model_name}] batch of {len(prompts)}: {e}")
+            if len(prompts) == 1:
+                responses = [None]
+            else:
+                self.batch_limits[model_name] = max(1, len(prompts) // 2)
+                self.batch_successes[model_name] = 0
+                self.failure_counts["batch_splits"] += 1
+                for prompt in prompts:
+                    self._record(prompt, "llm_retries")
+                time.sleep(LLM_RETRY_BACKOFF * 2 ** min(depth, 4))
+                mid = len(prompts) // 2
+                return (self._generate_chunk(backend, model_name, prompts[:mid], depth + 1)
+                        + self._generate_chunk(backend, model_name, prompts[mid:], depth + 1))
+        else:
+            self._grow_batch_limit(model_name, len(prompts))
+
+        return [
+            response if response is not None else self._retry_shortened(backend, model_name, prompt)
+            for prompt, response in zip(prompts, responses)
+        ]
+
+    def _retry_shortened(self, backend, model_name, prompt):
+        """Retries a single failed request up to LLM_MAX_RETRIES times, halving its context each time."""
+        for attempt in range(LLM_MAX_RETRIES):
+            self._record(prompt, "llm_retries")
+            time.sleep(LLM_RETRY_BACKOFF * 2 ** attempt)
+            # Logs come first and instructions last, so keep the tail of the user prompt
+            user_prompt = prompt[1]
+            prompt = (prompt[0], "[... earlier context omitted ...]\n" + user_prompt[len(user_prompt) // 2:]) + tuple(prompt[2:])
+            check_deadline([prompt])
+            try:
+                response = backend.generate_batch(model_name, [prompt])[0]
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                print(f"\n[LLM ERROR on {model_name}] retry {attempt + 1}/{LLM_MAX_RETRIES}: {e}")
+                continue
+            if response is not None:
+                return response
+        return None
+
+    def _grow_batch_limit(self, model_name, batch_size):
+        """Additive increase: after LLM_BATCH_RECOVERY full-size batches succeed, allow one more request per batch."""
+        limit = self.batch_limits.get(model_name)
+        if limit is None or batch_size < limit:
+            return
+        self.batch_successes[model_name] = self.batch_successes.get(model_name, 0) + 1
+        if self.batch_successes[model_name] >= LLM_BATCH_RECOVERY:
+            self.batch_successes[model_name] = 0
+            if limit + 1 >= LLM_MAX_BATCH:
+                del self.batch_limits[model_name]
+            else:
+                self.batch_limits[model_name] = limit + 1
+
+    def _record(self, prompt, counter):
+        """Counts a failure event globally and for the requesting agent (merged into the game stats)."""
+        self.failure_counts[counter] += 1
+        meta = prompt[3] if len(prompt) > 3 else {}
+        if meta.get("agent_name"):
+            agent = self.agent_counters.setdefault(meta["agent_name"], {})
+            agent[counter] = agent.get(counter, 0) + 1
+
+    def _caching(self):
+        # Unseeded games sample fresh answers; replaying cached ones would make them all play alike
+        return self.response_cache is not None and self.seed is not None
+
+    def _generate_key(self, model_name, prompt):
+        system_prompt, user_prompt, temperature = prompt[:3]
+        meta = prompt[3] if len(prompt) > 3 else {}
+        # agent_name only routes KV reuse; identical prompts from different agents share an entry
+        return request_key(
+            "generate", model_name, system_prompt, user_prompt, temperature, self.seed,
+            meta.get("call_type"), meta.get("options")
+        )
+
+    def score_options(self, model_name, system_prompt, user_prompt, options, agent_name=None):
+        """
+        Ranks a closed set of answers by log-probability.
+        Returns list of (option, logprob) sorted best first, or an empty list if scoring failed.
+        """
+        key = None
+        if self._caching():
+            key = request_key("score", model_name, system_prompt, user_prompt, options, self.seed)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return [tuple(pair) for pair in json.loads(cached)]
+
+        ranked = self.backend_for(model_name).score_options(model_name, system_prompt, user_prompt, options, agent_name=agent_name)
+        if not ranked:
+            self._record((system_prompt, user_prompt, 0.0, {"agent_name": agent_name}), "llm_failures")
+        if key is not None and ranked:
+            self.response_cache.put(key, model_name, json.dumps(ranked))
+        return ranked
+
+    def stats(self):
+        """Backend counters (e.g. prefix cache hit rate), keyed by backend name, plus response cache counters."""
+        stats = {name: backend.stats() for name, backend in self.backends.items() if backend.stats()}
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if self.prompt_builder.truncated_calls:
+            stats["prompt_builder"] = self.prompt_builder.stats()
+        if any(self.failure_counts.values()):
+            stats["failures"] = dict(self.failure_counts, batch_limits=dict(self.batch_limits))
+        return stats
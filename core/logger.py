@@ -1,14 +1,34 @@
 # core/logger.py
 import os
+import re
 import shutil
 import csv
+from config.settings import ROUND_LOG_FALLBACK_CHARS, OBSERVATION_FORMAT
+
+# Start of a round in the logs: "Round N/" (agent observation header) or "=== Round N ===" (results, discussion)
+ROUND_MARKER = re.compile(r"Round (\d+)/|=== Round (\d+) ===")
+
+
+def log_since_round(text, round_num):
+    """text from round_num's first marker on, or its tail when there is no marker (scans the text)."""
+    if not text:
+        return ""
+    match = re.search(f"(?:Round {round_num}/|=== Round {round_num} ===)", text)
+    return text[match.start():] if match else text[-ROUND_LOG_FALLBACK_CHARS:]
+
 
 class LogManager:
     def __init__(self, game_id, agents):
         """
         agents: List of Agent objects (needed to categorize into Byz/Honest folders)
+        Every log is also kept in memory (append-only) so agents read it without going back to disk;
+        the files are a write-through copy.
         """
         self.game_id = game_id
+        self.chunks = {}  # path -> list of appended strings
+        self.texts = {}  # path -> joined text, dropped on the next append
+        self.sizes = {}  # path -> characters written so far
+        self.round_offsets = {}  # path -> {round: character offset of its first marker}
         self.base_dir = os.path.join("logs", f"Game_{game_id}")
         
         # Clean/Create Directory
@@ -48,11 +68,66 @@ class LogManager:
                 "vote": vote_log_path
             }
 
+            # Compact observation memory, what agents read when OBSERVATION_FORMAT is "compact"
+            if OBSERVATION_FORMAT == "compact":
+                memory_log_path = os.path.join(agent_dir, "memory.log")
+                self._create_file(memory_log_path, f"=== Observations of {agent.name} ===\n")
+                self.paths["agents"][agent.name]["memory"] = memory_log_path
+
 
 
     def _create_file(self, path, initial_content=""):
         with open(path, "w", encoding="utf-8") as f:
             f.write(initial_content)
+        self.chunks[path] = [initial_content]
+        self.texts[path] = initial_content
+        self.sizes[path] = 0
+        self.round_offsets[path] = {}
+        self._index(path, initial_content)
+
+    def _append(self, path, content):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(content)
+        if path in self.chunks:
+            self.chunks[path].append(content)
+            self.texts.pop(path, None)
+            self._index(path, content)
+
+    def _index(self, path, content):
+        """Records where round markers in newly written content start, so round lookups need no scan."""
+        offsets = self.round_offsets[path]
+        for match in ROUND_MARKER.finditer(content):
+            round_num = int(match.group(1) or match.group(2))
+            if round_num not in offsets:
+                offsets[round_num] = self.sizes[path] + match.start()
+        self.sizes[path] += len(content)
+
+    def read_log(self, path):
+        """Full text of a log from memory (joined once per change); files this manager did not create are read from disk."""
+        if path not in self.chunks:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return f.read()
+            return ""
+        text = self.texts.get(path)
+        if text is None:
+            text = "".join(self.chunks[path])
+            self.chunks[path] = [text]
+            self.texts[path] = text
+        return text
+
+    def read_log_since(self, path, round_num):
+        """
+        The log at path from round round_num's first marker on, looked up in the offsets recorded at write time.
+        Without a marker for that round, its last ROUND_LOG_FALLBACK_CHARS characters.
+        """
+        if path not in self.chunks:
+            return log_since_round(self.read_log(path), round_num)
+        text = self.read_log(path)
+        if not text:
+            return ""
+        offset = self.round_offsets[path].get(int(round_num))
+        return text[offset:] if offset is not None else text[-ROUND_LOG_FALLBACK_CHARS:]
 
     def write_log(self, log_type, agent_name=None, content=""):
         """
@@ -62,27 +137,28 @@ class LogManager:
             path = self.paths["agents"].get(agent_name)
             path = path.get("action") 
             if path:
-                with open(path, "a", encoding="utf-8") as f:
-                    f.write(content + "\n")
+                self._append(path, content + "\n")
                     
         elif log_type == 'discussion':
             # Write to BOTH discussion logs so everyone sees the same public chat
-            with open(self.paths["discussion"], "a", encoding="utf-8") as f:
-                f.write(content + "\n")
+            self._append(self.paths["discussion"], content + "\n")
+
+        elif log_type == 'memory' and agent_name:
+            path = self.paths["agents"][agent_name].get("memory")
+            if path:
+                self._append(path, content)
 
         elif log_type == 'vote' and agent_name:
             path = self.paths["agents"].get(agent_name)
             path = path.get("vote") 
-            with open(path, "a", encoding="utf-8") as f:
-                    f.write(content + "\n")
+            self._append(path, content + "\n")
   
         elif log_type == 'results':
-            with open(self.paths["round_results"], "a", encoding="utf-8") as f:
-                f.write(content + "\n")
+            self._append(self.paths["round_results"], content + "\n")
         elif log_type == 'debug':
+            # Write-only, never kept in memory
             debug_log_path = os.path.join(self.base_dir, "debug.log")
-            with open(debug_log_path, "a", encoding="utf-8") as f:
-                f.write(content + "\n")
+            self._append(debug_log_path, content + "\n")
 
     def export_stats(self, agents_data):
         """
@@ -114,7 +190,9 @@ class LogManager:
 
         
     def get_agent_log_path(self, agent_name):
-        return self.paths["agents"][agent_name]["action"]
+        """The agent's own history as read into its prompts (compact memory.log or verbose action.log)."""
+        paths = self.paths["agents"][agent_name]
+        return paths.get("memory", paths["action"])
     
     def get_discussion_log_path(self, agent_role):
         return self.paths["discussion"]
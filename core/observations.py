@@ -0,0 +1,52 @@
+# core/observations.py
+# Compact rendering of the structured movement-phase records kept by GameState. The same record always
+# renders to the same text, one line per observation and one per action, e.g.
+#   Round 2/10 | Players Remaining: 8
+#   T1 @Weapons with Agent_4 | adj O2: -; Navigation: Agent_6, Agent_9 | bodies: -
+#   T1 did: move -> O2
+
+LEGEND = "(T<tick> @<your room> with <others there> | adj <room>: <occupants>; ... | bodies seen this round)\n"
+
+
+def observation_record(round_num, tick, location, occupants, adjacent, bodies):
+    """
+    One movement-phase observation of an agent.
+    occupants: others in the room; adjacent: list of (room, occupants); bodies: list of {"name", "room"}.
+    The action is filled in once the agent has chosen it.
+    """
+    return {
+        "round": round_num,
+        "tick": tick,
+        "location": location,
+        "occupants": list(occupants),
+        "adjacent": [(room, list(occ)) for room, occ in adjacent],
+        "bodies": [dict(b) for b in bodies],
+        "action": None,
+    }
+
+
+def _names(names):
+    return ", ".join(names) if names else "-"
+
+
+def render_header(round_num, num_rounds, count_str, teammates=None):
+    """Round header; teammates is a list of (name, status) for Byzantine agents."""
+    line = f"Round {round_num}/{num_rounds} | {count_str}"
+    if teammates:
+        line += " | Teammates: " + ", ".join(f"{name} {status}" for name, status in teammates)
+    return line + "\n" + LEGEND
+
+
+def render_observation(record):
+    adjacent = "; ".join(f"{room}: {_names(occ)}" for room, occ in record["adjacent"])
+    bodies = ", ".join(f"{b['name']} ({b['room']})" for b in record["bodies"]) or "-"
+    return (f"T{record['tick']} @{record['location']} with {_names(record['occupants'])}"
+            f" | adj {adjacent} | bodies: {bodies}\n")
+
+
+def render_action(record):
+    return f"T{record['tick']} did: {record['action']}\n"
+
+
+def render_round_end(reason):
+    return f"Round end, discussion: {reason}\n"
@@ -0,0 +1,127 @@
+# core/openai_backend.py
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from core.llm import DeadlineExceeded
+from core.telemetry import Telemetry
+from config.settings import (
+    MAX_NEW_TOKENS, OPENAI_BASE_URL, OPENAI_API_KEY_ENV, OPENAI_MAX_CONCURRENCY,
+    OPENAI_MAX_RETRIES, OPENAI_BACKOFF, OPENAI_TIMEOUT
+)
+
+# Status codes worth retrying (rate limited / server busy or restarting)
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class OpenAIBackend:
+    """
+    Sends generate calls to an OpenAI-compatible /chat/completions endpoint (vLLM, llama.cpp server, ...).
+    Model names are "openai:<served model id>", e.g. "openai:meta-llama/Llama-3.1-8B-Instruct",
+    or plain model ids when LLM_BACKEND / --backend is "openai".
+    One pooled keep-alive client is shared by all calls; at most OPENAI_MAX_CONCURRENCY requests are in flight,
+    and failed requests are retried with exponential backoff.
+    """
+    def __init__(self, base_url=OPENAI_BASE_URL, max_concurrency=OPENAI_MAX_CONCURRENCY):
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {os.environ.get(OPENAI_API_KEY_ENV, 'EMPTY')}"},
+            timeout=OPENAI_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.in_flight = threading.BoundedSemaphore(max_concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _model_id(self, model_name):
+        return model_name.split(":", 1)[1] if model_name.startswith("openai:") else model_name
+
+    def load_model(self, model_name):
+        # Weights live on the server; nothing to load locally
+        return
+
+    def generate_batch(self, model_name, prompts):
+        # Requests run concurrently; the server does the batching. Failed requests come back as None
+        return list(self.pool.map(lambda prompt: self._generate(model_name, prompt), prompts))
+
+    def score_options(self, model_name, system_prompt, user_prompt, options, agent_name=None):
+        """
+        Chat completions cannot score arbitrary continuations, so this generates an answer
+        and ranks the option it names first.
+        """
+        meta = {"agent_name": agent_name, "call_type": None, "options": options}
+        response = self._generate(model_name, (system_prompt, user_prompt, 0.0, meta))
+        if response is None:
+            return []
+        matched = [opt for opt in options if opt.upper() in response.upper()]
+        if not matched:
+            return []
+        return [(matched[0], 0.0)] + [(opt, -1.0) for opt in options if opt != matched[0]]
+
+    def _generate(self, model_name, prompt):
+        system_prompt, user_prompt, temperature = prompt[:3]
+        meta = prompt[3] if len(prompt) > 3 else {}
+        call_type = meta.get("call_type")
+        body = {
+            "model": self._model_id(model_name),
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": temperature,
+            "max_tokens": MAX_NEW_TOKENS.get(call_type, MAX_NEW_TOKENS["default"]),
+        }
+        if meta.get("options"):
+            # Closed-choice answers are a single line; stop server-side at the first newline
+            body["stop"] = ["\n"]
+
+        deadline = meta.get("deadline")
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            try:
+                # Never wait on the server past the request's deadline
+                timeout = OPENAI_TIMEOUT if deadline is None else max(0.1, min(OPENAI_TIMEOUT, deadline - time.time()))
+                with self.in_flight:
+                    self.requests += 1
+                    start = time.perf_counter()
+                    resp = self.client.post("/chat/completions", json=body, timeout=timeout)
+                    seconds = time.perf_counter() - start
+                if resp.status_code in RETRY_STATUS:
+                    raise httpx.HTTPStatusError(f"HTTP {resp.status_code}", request=resp.request, response=resp)
+                resp.raise_for_status()
+                data = resp.json()
+                content = (data["choices"][0]["message"]["content"] or "").strip()
+                # Tokens as reported by the server; a non-streamed request cannot split prefill from decode
+                usage = data.get("usage") or {}
+                Telemetry.get_instance().record(
+                    model_name, prompt, usage.get("prompt_tokens"), usage.get("completion_tokens"), None, seconds,
+                    attempt=attempt
+                )
+                return content
+
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if deadline is not None and time.time() > deadline:
+                    raise DeadlineExceeded(f"no answer from {model_name} before the deadline")
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRY_STATUS
+                if not retryable or attempt == OPENAI_MAX_RETRIES:
+                    self.failures += 1
+                    print(f"\n[LLM ERROR on {model_name}]: {e}")
+                    return None  # ModelManager retries or records the failure
+                self.retries += 1
+                # Exponential backoff with jitter so concurrent retries don't stampede the server
+                time.sleep(OPENAI_BACKOFF * (2 ** attempt) * (1 + random.random()))
+
+            except (KeyError, IndexError, ValueError) as e:
+                # Malformed response body; retrying the same request won't fix it
+                self.failures += 1
+                print(f"\n[LLM ERROR on {model_name}]: bad response {e}")
+                return None
+
+    def stats(self):
+        if not self.requests:
+            return {}
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
@@ -0,0 +1,188 @@
+# core/prefix_cache.py
+import copy
+import threading
+from collections import OrderedDict
+
+
+def common_prefix_len(a, b):
+    """Number of leading tokens two id sequences share."""
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class _Node:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children = {}  # first token of edge -> (edge tokens, child node)
+        self.entries = set()  # keys of cached sequences passing through this node
+
+
+class PrefixCache:
+    """
+    Radix tree of cached prompt KV states, shared across agents.
+    Each (model_name, agent_name) key holds the KV state of that agent's last prompt.
+    A lookup walks the model's tree to find the longest prefix computed by ANY agent,
+    so the rules, map and results log are prefilled once per tick instead of once per agent.
+    Entries are evicted least-recently-used first once the cached tensors exceed max_bytes;
+    pinned entries (static prompt prefixes such as a role's system prompt) are never evicted.
+    Safe to share between threads (the inference daemon runs one scheduler thread per model).
+    """
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self.entries = OrderedDict()  # key -> (token_ids, cache, nbytes)
+        self.roots = {}  # model_name -> _Node
+        self.total_bytes = 0
+        self.pinned = set()
+        self.lock = threading.Lock()  # guards the tree, entries and counters
+
+        # Hit-rate counters
+        self.lookups = 0
+        self.hits = 0
+        self.shared_hits = 0  # hits served from another agent's entry
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+
+    def take(self, key, token_ids):
+        """
+        Returns (cache, prefix_len) for the longest cached prefix of token_ids.
+        The caller owns the returned cache: the agent's own entry is handed over,
+        another agent's entry is copied so it stays valid for them.
+        """
+        with self.lock:
+            return self._take(key, tuple(token_ids))
+
+    def _take(self, key, token_ids):
+        self.lookups += 1
+        root = self.roots.get(key[0])
+        owner, matched = self._longest_match(root, token_ids, key) if root else (None, 0)
+
+        # At least one token has to be left over to prefill
+        prefix_len = min(matched, len(token_ids) - 1)
+        if owner is None or prefix_len <= 0:
+            self.prefilled_tokens += len(token_ids)
+            return None, 0
+
+        if owner == key:
+            _, cache, _ = self._remove(key)
+        else:
+            cache = copy.deepcopy(self.entries[owner][1])
+            self.entries.move_to_end(owner)
+            self.shared_hits += 1
+
+        self.hits += 1
+        self.reused_tokens += prefix_len
+        self.prefilled_tokens += len(token_ids) - prefix_len
+        return cache, prefix_len
+
+    def put(self, key, token_ids, cache, pinned=False):
+        """Stores the KV state of token_ids as key's entry, replacing any previous one."""
+        nbytes = self._sizeof(cache)
+        with self.lock:
+            self._put(key, tuple(token_ids), cache, nbytes, pinned)
+
+    def _put(self, key, token_ids, cache, nbytes, pinned):
+        if key in self.entries:
+            self._remove(key)
+        if nbytes > self.max_bytes:
+            return
+
+        self.entries[key] = (token_ids, cache, nbytes)
+        self.total_bytes += nbytes
+        self._insert(self.roots.setdefault(key[0], _Node()), token_ids, key)
+        if pinned:
+            self.pinned.add(key)
+
+        while self.total_bytes > self.max_bytes:
+            victim = next((k for k in self.entries if k not in self.pinned), None)
+            if victim is None:
+                break
+            self._remove(victim)
+
+    def drop_model(self, model_name):
+        """Forgets every entry of a model, e.g. when it is evicted from memory."""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == model_name]:
+                self._remove(key)
+            self.roots.pop(model_name, None)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def stats(self):
+        with self.lock:
+            return self._stats()
+
+    def _stats(self):
+        total = self.reused_tokens + self.prefilled_tokens
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "reused_tokens": self.reused_tokens,
+            "prefilled_tokens": self.prefilled_tokens,
+            "prefill_saved": round(self.reused_tokens / total, 3) if total else 0.0,
+            "cached_mb": round(self.total_bytes / (1024 * 1024), 1),
+            "pinned": len(self.pinned),
+        }
+
+    def _longest_match(self, root, token_ids, preferred):
+        owner, depth = None, 0
+        node, i = root, 0
+        while i < len(token_ids) and token_ids[i] in node.children:
+            edge, child = node.children[token_ids[i]]
+            m = common_prefix_len(edge, token_ids[i:i + len(edge)])
+            i += m
+            # Every entry through child covers the i tokens matched so far; prefer our own (no copy)
+            owner = preferred if preferred in child.entries else next(iter(child.entries))
+            depth = i
+            if m < len(edge):
+                break
+            node = child
+        return owner, depth
+
+    def _insert(self, root, token_ids, key):
+        node, i = root, 0
+        node.entries.add(key)
+        while i < len(token_ids):
+            first = token_ids[i]
+            if first not in node.children:
+                child = _Node()
+                child.entries.add(key)
+                node.children[first] = (token_ids[i:], child)
+                return
+
+            edge, child = node.children[first]
+            m = common_prefix_len(edge, token_ids[i:i + len(edge)])
+            if m < len(edge):
+                # Split the edge where the new sequence diverges
+                mid = _Node()
+                mid.entries = set(child.entries)
+                mid.children[edge[m]] = (edge[m:], child)
+                node.children[first] = (edge[:m], mid)
+                child = mid
+            child.entries.add(key)
+            node, i = child, i + m
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.pinned.discard(key)
+        token_ids, _, nbytes = entry
+        self.total_bytes -= nbytes
+
+        node, i = self.roots[key[0]], 0
+        node.entries.discard(key)
+        while i < len(token_ids):
+            edge, child = node.children[token_ids[i]]
+            child.entries.discard(key)
+            if not child.entries:
+                del node.children[token_ids[i]]
+                break
+            node, i = child, i + len(edge)
+        return entry
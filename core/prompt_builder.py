@@ -0,0 +1,102 @@
+# core/prompt_builder.py
+
+ELIDED = "[... earlier entries omitted ...]\n"  # fixed, so the cut prompt stays a stable prefix
+MIN_SECTION_TOKENS = 32  # a section cut below this is dropped entirely
+CUT_HEADROOM = 0.75  # a new cut keeps this share of the section's budget, leaving room for later appends
+SHARED_SHARE = 0.5  # most of the budget a section shared by every agent keeps, see fit
+
+
+class PromptBuilder:
+    """
+    Fits the variable sections of a prompt (logs) into a token budget, counted with the model's tokenizer.
+    Sections are (name, text, priority) tuples; higher priority is kept longer. Over budget, the
+    lowest-priority sections are cut first, keeping their most recent lines and eliding the oldest.
+    A cut stays at the same line while the section's tail still fits, so later calls share its prefix.
+    """
+    def __init__(self, count_tokens):
+        self.count_tokens = count_tokens  # (model_name, text, stream key) -> tokens
+        self.calls = 0
+        self.truncated_calls = 0
+        self.dropped_tokens = 0
+        self.cuts = {}  # (model_name, label, section) -> char offset of the line the section was last cut at
+
+    def fit(self, model_name, sections, budget, label="", shared=(), group=""):
+        """
+        Returns {name: text} with the sections' total tokens within budget (None = no limit).
+        shared names sections whose text is the same for every agent (the results log). They are cut to
+        SHARED_SHARE of the budget whatever the other sections hold, at a line kept per (model, group, section),
+        so every agent's prompt for that group (call type) keeps the same prefix; the other sections share
+        what is left, by priority.
+        """
+        self.calls += 1
+        fitted = {name: text for name, text, _ in sections}
+        if budget is None:
+            return fitted
+
+        # Each (label, section) is an append-only stream, so its tokenization is reused across calls
+        streams = {name: (group, name) if name in shared else (label, name) for name, _, _ in sections}
+        counts = {name: self.count_tokens(model_name, text, streams[name]) if text else 0 for name, text, _ in sections}
+
+        dropped = 0
+        cut_names = []
+        cap = int(budget * SHARED_SHARE)
+        for name, text, _ in sections:
+            if name in shared and counts[name] > cap:
+                fitted[name] = self._keep_tail(model_name, text, counts[name], cap, (model_name, group, name))
+                kept = self.count_tokens(model_name, fitted[name], None)
+                dropped += counts[name] - kept
+                counts[name] = kept
+                cut_names.append(name)
+
+        over = sum(counts.values()) - budget
+        for name, text, _ in sorted(sections, key=lambda s: s[2]):
+            if over <= 0:
+                break
+            if name in shared or not counts[name]:
+                continue
+            keep = counts[name] - over
+            if keep < MIN_SECTION_TOKENS:
+                fitted[name] = ""
+                kept = 0
+            else:
+                fitted[name] = self._keep_tail(model_name, text, counts[name], keep, (model_name, label, name))
+                kept = self.count_tokens(model_name, fitted[name], None)
+            dropped += counts[name] - kept
+            over -= counts[name] - kept
+            cut_names.append(name)
+
+        if not cut_names:
+            return fitted
+        self.truncated_calls += 1
+        self.dropped_tokens += dropped
+        print(f"[PromptBuilder] {label}: dropped {dropped} tokens from {', '.join(cut_names)} (budget {budget})")
+        return fitted
+
+    def _keep_tail(self, model_name, text, tokens, max_tokens, stream):
+        """
+        Most recent whole lines of text within max_tokens, prefixed with ELIDED. Starts from the stream's
+        previous cut when text still has a line start there, and only moves it once that tail no longer fits.
+        """
+        max_tokens -= self.count_tokens(model_name, ELIDED, None)
+        start = self.cuts.get(stream, 0)
+        if not 0 < start <= len(text) or text[start - 1] != "\n":
+            start = 0
+        if start:
+            tokens = self.count_tokens(model_name, text[start:], None)
+        if tokens > max_tokens:
+            target = max_tokens * CUT_HEADROOM
+            while tokens > target and start < len(text):
+                # Cut proportionally (tokens per char is roughly constant within a log), then snap to a line start
+                keep_chars = int((len(text) - start) * target / tokens)
+                newline = text.find("\n", len(text) - keep_chars - 1)
+                start = newline + 1 if 0 <= newline < len(text) - 1 else len(text)
+                tokens = self.count_tokens(model_name, text[start:], None)
+            self.cuts[stream] = start
+        return ELIDED + text[start:]
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "truncated_calls": self.truncated_calls,
+            "dropped_tokens": self.dropped_tokens,
+        }
@@ -0,0 +1,82 @@
+# core/residency.py
+import time
+from collections import OrderedDict
+
+
+class ModelResidency:
+    """
+    Keeps resident models within a memory budget (VRAM on GPU nodes, RAM on CPU nodes).
+    Models are tracked in least-recently-used order with their footprint; before a load, the
+    least recently used models are evicted (or offloaded by the backend) until the new one fits.
+    A budget of None never evicts and only records load times.
+    """
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        self.resident = OrderedDict()  # model_name -> footprint bytes, least recently used first
+        self.seen = set()  # models loaded at least once, to tell reloads from first loads
+        self.loading = set()  # reservations of in-flight loads, never picked for eviction
+
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.reload_seconds = 0.0
+        self.evict_seconds = 0.0
+
+    def touch(self, model_name):
+        if model_name in self.resident:
+            self.resident.move_to_end(model_name)
+
+    def used_bytes(self):
+        return sum(self.resident.values())
+
+    def make_room(self, needed_bytes, evict):
+        """
+        Calls evict(model_name) on least recently used models until needed_bytes fits in the budget.
+        Models still loading are skipped; if only those are left the budget is overrun.
+        """
+        if self.budget_bytes is None:
+            return
+        while self.used_bytes() + needed_bytes > self.budget_bytes:
+            victim = next((name for name in self.resident if name not in self.loading), None)
+            if victim is None:
+                break
+            start = time.perf_counter()
+            evict(victim)
+            self.evict_seconds += time.perf_counter() - start
+            del self.resident[victim]
+            self.evictions += 1
+            print(f"Evicted {victim} to fit {needed_bytes / 1024**3:.1f} GB (budget {self.budget_bytes / 1024**3:.1f} GB)")
+
+    def reserve(self, model_name, footprint_bytes):
+        """Counts an estimated footprint against the budget while the model is still loading."""
+        self.resident[model_name] = footprint_bytes
+        self.loading.add(model_name)
+
+    def release(self, model_name):
+        """Drops a reservation whose load failed."""
+        self.resident.pop(model_name, None)
+        self.loading.discard(model_name)
+
+    def record_load(self, model_name, footprint_bytes, seconds):
+        if model_name in self.seen:
+            self.reloads += 1
+            self.reload_seconds += seconds
+        else:
+            self.loads += 1
+            self.load_seconds += seconds
+            self.seen.add(model_name)
+        self.resident[model_name] = footprint_bytes
+        self.loading.discard(model_name)
+
+    def stats(self):
+        return {
+            "resident": list(self.resident),
+            "used_gb": round(self.used_bytes() / 1024**3, 2),
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "load_seconds": round(self.load_seconds, 1),
+            "reload_seconds": round(self.reload_seconds, 1),
+            "evict_seconds": round(self.evict_seconds, 1),
+        }
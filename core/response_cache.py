@@ -0,0 +1,87 @@
+# core/response_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def request_key(*parts):
+    """Content address of a request: sha256 over its JSON-encoded inputs."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses keyed by a hash of the request inputs.
+    Shared safely by several game processes on a node (WAL mode). Once the stored responses exceed
+    max_bytes, the least recently used ones are evicted (checked every EVICT_CHECK_EVERY writes).
+    """
+    EVICT_CHECK_EVERY = 64
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts_since_check = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, value TEXT, nbytes INTEGER, last_access REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, model_name, value):
+        nbytes = len(value.encode("utf-8"))
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, nbytes, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, value, nbytes, time.time())
+            )
+            self._puts_since_check += 1
+            if self._puts_since_check >= self.EVICT_CHECK_EVERY:
+                self._puts_since_check = 0
+                self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self.db.execute("SELECT key, nbytes FROM responses ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                break
+            for key, nbytes in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.evictions += 1
+                total -= nbytes
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
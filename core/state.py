@@ -2,13 +2,19 @@
 import json
 import random
 from datetime import datetime
-from config.settings import ROOMS, NUM_ROUNDS
+from config.settings import ROOMS, NUM_ROUNDS, OBSERVATION_FORMAT, VERBOSE_ACTION_LOG
+from core.observations import (
+    observation_record, render_header, render_observation, render_action, render_round_end
+)
 
 class GameState:
     def __init__(self, agents, log_manager):
         self.agents = agents
         self.logger = log_manager
         self.live_state_file = "live_state.json"
+        self.observations = {agent.name: [] for agent in agents}  # agent_name -> movement-phase observation records
+        self.compact = OBSERVATION_FORMAT == "compact"
+        self.verbose = not self.compact or VERBOSE_ACTION_LOG
         self.world_data = {
             "game_id": self.logger.game_id,
             "global": {
@@ -57,7 +63,14 @@ class GameState:
                     "times_eliminated": 0, # if the agent was eliminated, not ejections
                     "ejections": 0,
                     "num_moves": 0, # if stays in place, does not count as move
-                    "votes_received": 0
+                    "votes_received": 0,
+                    "llm_failures": 0, # requests that failed after all retries
+                    "llm_retries": 0,
+                    "llm_fallbacks": 0, # requests answered by a fallback model/policy after missing their deadline
+                    "llm_calls": 0, # inference telemetry totals, see core/telemetry.py
+                    "total_prompt_tokens": 0,
+                    "total_new_tokens": 0,
+                    "llm_seconds": 0.0
                     
                 }
             }
@@ -137,6 +150,7 @@ class GameState:
         # --- 2. Build Surroundings ---
         surroundings = {loc: {"occupants": occupants, "bodies": current_room_bodies}}
         adj_log_str = ""
+        adjacent = []
         if loc in ROOMS:
             for neighbor in ROOMS[loc]:
                 neighbor_data = self.world_data["rooms"][neighbor].copy()
@@ -145,19 +159,21 @@ class GameState:
                 # Determine occupants string for log
                 occ = [p for p in self.world_data["rooms"][neighbor]["occupants"] if p != agent_name]
                 adj_log_str += f"\n    [{neighbor}] -> Occupants: {occ if occ else 'None'}"
+                adjacent.append((neighbor, occ))
 
         # --- 3. Role Specific (Teammates) ---
         teammate_str = ""
+        tm_status = []
         if agent_data["role"] == "byzantine":
             teammates = [a.name for a in self.agents if a.role == "byzantine" and a.name != agent_name]
-            tm_status = []
             for tm in teammates:
                 status = self.world_data["agents"][tm]["status"]
-                tm_status.append(f"{tm}: {status}")
-            teammate_str = f"Teammate(s) Status: {' || '.join(tm_status)}\n"
+                tm_status.append((tm, status))
+            teammate_str = f"Teammate(s) Status: {' || '.join(f'{tm}: {status}' for tm, status in tm_status)}\n"
 
         # --- 4. Conditional Header ---
         header_str = ""
+        compact_header = ""
         # Only check/update header if we are actually logging
         if log_to_file and agent_data["last_round_seen"] < round_num:
             header_str = (
@@ -165,6 +181,7 @@ class GameState:
                 f"{count_str}\n"
                 f"{teammate_str}"
             )
+            compact_header = render_header(round_num, NUM_ROUNDS, count_str, tm_status)
             self.world_data["agents"][agent_name]["last_round_seen"] = round_num
 
 
@@ -184,7 +201,17 @@ class GameState:
                 f"Adjacent Location(s):{adj_log_str}\n"
                 f"Bodies Seen: {bodies_log_str}\n"
             )
-            self.logger.write_log("agent", agent_name, log_entry)
+            if self.verbose:
+                self.logger.write_log("agent", agent_name, log_entry)
+
+            # Structured record of the same observation; its compact rendering is what agents read
+            record = observation_record(
+                round_num, agent_data["action_num"] + 1, loc,
+                [o for o in occupants if o != agent_name], adjacent, agent_data["known_bodies"]
+            )
+            self.observations[agent_name].append(record)
+            if self.compact:
+                self.logger.write_log("memory", agent_name, compact_header + render_observation(record))
 
         # Return Data Structure
         view = {
@@ -211,7 +238,13 @@ class GameState:
         self.world_data["agents"][agent_name]["action_num"] += 1
         current_action_num = self.world_data["agents"][agent_name]["action_num"]
         
-        self.logger.write_log("agent", agent_name, f"Action {current_action_num} Selected: {clean_action}\n======================\n")
+        if self.verbose:
+            self.logger.write_log("agent", agent_name, f"Action {current_action_num} Selected: {clean_action}\n======================\n")
+        records = self.observations[agent_name]
+        if records and records[-1]["action"] is None:
+            records[-1]["action"] = clean_action
+            if self.compact:
+                self.logger.write_log("memory", agent_name, render_action(records[-1]))
         if raw_response is not None:
             self.logger.write_log("debug", None, f"[DEBUG] {agent_name} | {self.world_data['agents'][agent_name]['role']} | raw response: {raw_response}\n")
 
@@ -320,7 +353,10 @@ class GameState:
         )
         for name, data in self.world_data["agents"].items():
             # We log this for all agents so they know why the movement phase stopped
-            self.logger.write_log("agent", name, end_msg)
+            if self.verbose:
+                self.logger.write_log("agent", name, end_msg)
+            if self.compact:
+                self.logger.write_log("memory", name, render_round_end(reason))
 
     def _clear_all_bodies(self):
         """Resets bodies on the map so they aren't seen in the next round."""
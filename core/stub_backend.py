@@ -0,0 +1,108 @@
+# core/stub_backend.py
+import random
+import time
+from config.settings import STUB_SEED, STUB_TOKEN_LATENCY, STUB_PREFILL_LATENCY
+from core.llm import check_deadline
+from core.telemetry import Telemetry
+
+DISCUSSION_LINES = [
+    "I have no new information, I stayed around my area this round.",
+    "I did not see anything suspicious on my route.",
+    "Can anyone confirm where they were when the body was found?",
+    "I think we should skip unless someone saw something concrete.",
+    "My path was quiet, I only passed a couple of agents.",
+]
+
+
+def approx_tokens(text):
+    """Rough token count (about 4 characters per token) used for simulated latency."""
+    return max(1, len(text) // 4)
+
+
+class StubBackend:
+    """
+    Deterministic offline backend that needs no torch or weights.
+    Model names:
+    - "stub:random" (or "stub:seed=N"): seeded-random pick from the call's options,
+    - "stub:script=path/to/file": answers taken line by line from a file ('#' lines skipped),
+      falling back to seeded-random picks once the script runs out or a line is not a valid option.
+    Latency is simulated per prompt token (STUB_PREFILL_LATENCY) and per output token (STUB_TOKEN_LATENCY).
+    """
+    def __init__(self):
+        self.models = {}  # model_name -> {"rng", "script"}
+        self.calls = 0
+
+    def load_model(self, model_name):
+        if model_name in self.models:
+            return
+
+        spec = model_name.split(":", 1)[1] if ":" in model_name else "random"
+        seed = STUB_SEED
+        script = []
+        for part in spec.split(","):
+            if part.startswith("seed="):
+                seed = int(part[len("seed="):])
+            elif part.startswith("script="):
+                with open(part[len("script="):], "r", encoding="utf-8") as f:
+                    script = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+        script.reverse()  # pop() from the end
+
+        self.models[model_name] = {"rng": random.Random(seed), "script": script}
+        print(f"Model {model_name} loaded successfully.")
+
+    def generate_batch(self, model_name, prompts):
+        self.load_model(model_name)
+        state = self.models[model_name]
+
+        responses = []
+        latency = 0.0
+        telemetry = Telemetry.get_instance()
+        for prompt in prompts:
+            system_prompt, user_prompt = prompt[0], prompt[1]
+            meta = prompt[3] if len(prompt) > 3 else {}
+            response = self._respond(state, meta.get("options"), meta.get("call_type"))
+            responses.append(response)
+
+            # A batch runs as one forward pass, so it costs as much as its slowest row
+            prompt_tokens, new_tokens = approx_tokens(system_prompt + user_prompt), approx_tokens(response)
+            row = prompt_tokens * STUB_PREFILL_LATENCY + new_tokens * STUB_TOKEN_LATENCY
+            latency = max(latency, row)
+            telemetry.record(model_name, prompt, prompt_tokens, new_tokens, prompt_tokens * STUB_PREFILL_LATENCY,
+                             new_tokens * STUB_TOKEN_LATENCY, batch_size=len(prompts))
+
+        self.calls += len(prompts)
+        deadlines = [p[3]["deadline"] for p in prompts if len(p) > 3 and p[3].get("deadline") is not None]
+        if deadlines:
+            # Simulated cancellation: stop waiting at the earliest deadline
+            latency = min(latency, max(0.0, min(deadlines) - time.time() + 0.001))
+        if latency:
+            time.sleep(latency)
+        check_deadline(prompts)
+        return responses
+
+    def score_options(self, model_name, system_prompt, user_prompt, options, agent_name=None):
+        self.load_model(model_name)
+        choice = self._respond(self.models[model_name], options, None)
+        prompt_tokens = approx_tokens(system_prompt + user_prompt)
+        if STUB_PREFILL_LATENCY:
+            time.sleep(prompt_tokens * STUB_PREFILL_LATENCY)
+        self.calls += 1
+        meta = {"agent_name": agent_name, "call_type": None}
+        Telemetry.get_instance().record(model_name, (system_prompt, user_prompt, 0.0, meta), prompt_tokens, 0,
+                                        prompt_tokens * STUB_PREFILL_LATENCY, 0.0, options=len(options))
+        return [(choice, 0.0)] + [(opt, -1.0) for opt in options if opt != choice]
+
+    def _respond(self, state, options, call_type):
+        if state["script"]:
+            line = state["script"].pop()
+            if not options or line in options:
+                return line
+
+        if options:
+            return state["rng"].choice(options)
+        if call_type == "discussion":
+            return state["rng"].choice(DISCUSSION_LINES)
+        return ""
+
+    def stats(self):
+        return {"calls": self.calls} if self.calls else {}
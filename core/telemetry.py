@@ -0,0 +1,103 @@
+# core/telemetry.py
+import json
+import os
+import threading
+import time
+
+
+# Backend measurements of one request, as recorded (and passed back by the inference daemon)
+MEASUREMENTS = ("prompt_tokens", "new_tokens", "prefill_seconds", "decode_seconds")
+
+
+class Telemetry:
+    """
+    Per-call inference records for the running game, one JSON line per request in <game log dir>/telemetry.jsonl.
+    Each record is tagged with the game, agent, role, phase, round and tick (set by the engine via set_context)
+    and holds prompt/new tokens and prefill/decode seconds as measured by the backend.
+    Rows of a batched call each get an equal share of the batch's time.
+    Per-agent totals are joined into stats.csv.
+    The inference daemon has no game of its own; it captures the records of requests tagged with
+    meta["telemetry_id"] and returns them to the game process (see take).
+    """
+    _instance = None
+    TOTAL_FIELDS = ["llm_calls", "total_prompt_tokens", "total_new_tokens", "llm_seconds"]
+
+    def __init__(self):
+        self.game_id = None
+        self.file = None
+        self.roles = {}  # agent_name -> role
+        self.context = {"phase": None, "round": None, "tick": None}
+        self.totals = {}  # agent_name -> {TOTAL_FIELDS}
+        self.captured = None  # telemetry_id -> measurements, once capture() is on
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start_game(self, game_id, log_dir, roles):
+        self.close()
+        self.game_id = game_id
+        self.roles = dict(roles)
+        self.totals = {}
+        self.file = open(os.path.join(log_dir, "telemetry.jsonl"), "a", encoding="utf-8")
+
+    def set_context(self, **context):
+        """Updates the phase/round/tick tags of the calls that follow."""
+        self.context.update(context)
+
+    def record(self, model_name, prompt, prompt_tokens, new_tokens, prefill_seconds, decode_seconds, **extra):
+        """
+        Records one request. prompt is the (system, user, temperature[, meta]) tuple; token counts or
+        prefill time may be None when the backend cannot measure them.
+        """
+        meta = prompt[3] if len(prompt) > 3 else {}
+        agent = meta.get("agent_name")
+        entry = {
+            "time": round(time.time(), 3),
+            "game_id": self.game_id,
+            "agent": agent,
+            "role": self.roles.get(agent),
+            "phase": meta.get("call_type") or self.context["phase"],
+            "round": self.context["round"],
+            "tick": self.context["tick"],
+            "model": model_name,
+            "prompt_tokens": prompt_tokens,
+            "new_tokens": new_tokens,
+            "prefill_seconds": round(prefill_seconds, 4) if prefill_seconds is not None else None,
+            "decode_seconds": round(decode_seconds, 4) if decode_seconds is not None else None,
+        }
+        entry.update(extra)
+
+        with self.lock:
+            if self.captured is not None and meta.get("telemetry_id") is not None:
+                self.captured[meta["telemetry_id"]] = {k: entry[k] for k in MEASUREMENTS + tuple(extra)}
+            if self.file is not None:
+                self.file.write(json.dumps(entry) + "\n")
+            if agent:
+                totals = self.totals.setdefault(agent, dict.fromkeys(self.TOTAL_FIELDS, 0))
+                totals["llm_calls"] += 1
+                totals["total_prompt_tokens"] += prompt_tokens or 0
+                totals["total_new_tokens"] += new_tokens or 0
+                totals["llm_seconds"] = round(totals["llm_seconds"] + (prefill_seconds or 0.0) + (decode_seconds or 0.0), 3)
+
+    def capture(self):
+        """Keeps the measurements of requests carrying meta["telemetry_id"] until take() collects them."""
+        with self.lock:
+            self.captured = {}
+
+    def take(self, telemetry_id):
+        """Measurements recorded for telemetry_id (the last record if a request was retried), or None."""
+        with self.lock:
+            return self.captured.pop(telemetry_id, None) if self.captured is not None else None
+
+    def agent_totals(self):
+        return self.totals
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,104 @@
+# core/token_cache.py
+import time
+from collections import OrderedDict
+
+
+def common_prefix_chars(a, b):
+    """Length of the common prefix of two strings (binary search over slice compares, which run in C)."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class TokenCache:
+    """
+    Incremental tokenization of prompts that mostly extend the previous prompt of the same stream
+    (an agent's call type, a log section). Each key remembers its last text, token ids and character offsets.
+    A new text reuses the cached tokens up to a rewind point before the first changed character, and only
+    the rest is tokenized. The rewind point is the start of a token that begins a line, at least one line
+    before the change, so appended text cannot merge with reused tokens (pre-tokenizers split at newlines).
+    Needs a fast tokenizer (offset mapping); otherwise every text is tokenized in full.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (text, ids, offsets)
+
+        self.calls = 0
+        self.hits = 0
+        self.reused_tokens = 0
+        self.tokenized_tokens = 0
+        self.reused_chars = 0
+        self.tokenized_chars = 0
+        self.seconds = 0.0
+
+    def encode(self, tokenizer, key, text):
+        """Token ids of text (no special tokens), reusing key's previous tokenization where possible."""
+        start = time.perf_counter()
+        self.calls += 1
+        if key is None or not getattr(tokenizer, "is_fast", False):
+            ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+            self._count(0, len(ids), 0, len(text), start)
+            return ids
+
+        keep_tokens, keep_chars = 0, 0
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keep_tokens, keep_chars = self._rewind_point(entry, text)
+
+        encoded = tokenizer(text[keep_chars:], add_special_tokens=False, return_offsets_mapping=True)
+        ids = entry[1][:keep_tokens] + encoded["input_ids"] if keep_tokens else encoded["input_ids"]
+        offsets = (entry[2][:keep_tokens] if keep_tokens else []) + [
+            (s + keep_chars, e + keep_chars) for s, e in encoded["offset_mapping"]
+        ]
+
+        self.entries[key] = (text, ids, offsets)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        if keep_tokens:
+            self.hits += 1
+        self._count(keep_tokens, len(encoded["input_ids"]), keep_chars, len(text) - keep_chars, start)
+        return ids
+
+    def _rewind_point(self, entry, text):
+        old_text, _, offsets = entry
+        changed = common_prefix_chars(old_text, text)
+        # Back off to the start of the line before the changed one; a token must start exactly there
+        prev_newline = old_text.rfind("\n", 0, changed)
+        line_start = old_text.rfind("\n", 0, prev_newline) + 1 if prev_newline > 0 else 0
+        if line_start <= 0:
+            return 0, 0
+        lo, hi = 0, len(offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if offsets[mid][0] < line_start:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= len(offsets) or offsets[lo][0] != line_start:
+            return 0, 0  # no token boundary at the line start, tokenize in full
+        return lo, line_start
+
+    def _count(self, reused_tokens, tokenized_tokens, reused_chars, tokenized_chars, start):
+        self.reused_tokens += reused_tokens
+        self.tokenized_tokens += tokenized_tokens
+        self.reused_chars += reused_chars
+        self.tokenized_chars += tokenized_chars
+        self.seconds += time.perf_counter() - start
+
+    def stats(self):
+        # Time saved is estimated from the measured cost per tokenized character
+        per_char = self.seconds / self.tokenized_chars if self.tokenized_chars else 0.0
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "reused_tokens": self.reused_tokens,
+            "tokenized_tokens": self.tokenized_tokens,
+            "seconds": round(self.seconds, 3),
+            "saved_seconds_est": round(self.reused_chars * per_char, 3),
+        }
@@ -1,11 +1,15 @@
 # game/engine.py
 import random
 import re
-from config.settings import MAX_MOVEMENT_PHASES, ROOMS, NUM_BYZ, NUM_HONEST
+from config.settings import MAX_MOVEMENT_PHASES, ROOMS, NUM_BYZ, NUM_HONEST, DECISION_MODE
 from agents.honest_agent import HonestAgent
 from agents.byzantine_agent import ByzantineAgent
+from agents.heuristic_agent import HeuristicHonestAgent, HeuristicByzantineAgent
+from config.model_composition import HEURISTIC
 from core.state import GameState
 from core.logger import LogManager
+from core.llm import ModelManager
+from core.telemetry import Telemetry
 
 class GameEngine:
     def __init__(self, game_id, num_agents=NUM_BYZ + NUM_HONEST):
@@ -31,8 +35,9 @@ class GameEngine:
             assigned_model = byz_models[i % len(byz_models)]
             
             teammates = [b for b in byz_names if b != name]
+            agent_class = HeuristicByzantineAgent if assigned_model == HEURISTIC else ByzantineAgent
             self.agents.append(
-                ByzantineAgent(name, colors[i], teammates, assigned_model)
+                agent_class(name, colors[i], teammates, assigned_model)
             )
 
         # 2. Create Honest Agents
@@ -44,15 +49,19 @@ class GameEngine:
             # CYCLE through the list of models using modulo
             assigned_model = honest_models[i % len(honest_models)]
             
+            agent_class = HeuristicHonestAgent if assigned_model == HEURISTIC else HonestAgent
             self.agents.append(
-                HonestAgent(name, color, assigned_model)
+                agent_class(name, color, assigned_model)
             )
 
         random.shuffle(self.agents)
 
         self.logger = LogManager(self.game_id, self.agents)
+        for agent in self.agents:
+            agent.log_store = self.logger  # agents read logs from memory instead of disk
         self.state = GameState(self.agents, self.logger)
         self.state.save_json()
+        Telemetry.get_instance().start_game(self.game_id, self.logger.base_dir, {a.name: a.role for a in self.agents})
         print(f"--- Game Setup Complete. Logs at: logs/Game_{self.game_id} ---")
 
     def run_movement_phase(self, round_num):
@@ -62,14 +71,20 @@ class GameEngine:
         event_occurred_in_round = False
         for phase_tick in range(1, MAX_MOVEMENT_PHASES + 1):
             print(f"Tick {phase_tick}...")
+            Telemetry.get_instance().set_context(phase="movement", round=round_num, tick=phase_tick)
             active_agents = [a for a in self.agents if self.state.world_data["agents"][a.name]["status"] == "active"]
             
             # --- 1. GATHER DECISIONS ---
-            decisions = []
+            # Build every prompt first, then run one batch per model for the whole tick
+            requests = []
             for agent in active_agents:
                 view = self.state.get_agent_view(agent.name, round_num, log_to_file=True)
-                decision = agent.think_and_act(view, round_num)
-                decisions.append((agent, decision))
+                requests.append(agent.prepare_action(view, round_num))
+
+            responses = self._generate_tick(active_agents, requests)
+            decisions = []
+            for agent, request, response in zip(active_agents, requests, responses):
+                decisions.append((agent, agent.resolve_action(request, response)))
             
             reports, kills, buttons, moves = [], [], [], []
             
@@ -147,6 +162,35 @@ class GameEngine:
 
         return False
 
+    def _generate_tick(self, agents, requests):
+        """Groups the tick's prompts by model and generates each group in one batch."""
+        if DECISION_MODE == "score":
+            # Each decision is a single prefill plus option tokens, nothing to pad together
+            return [agent.respond(request) for agent, request in zip(agents, requests)]
+
+        by_model = {}
+        responses = [None] * len(agents)
+        for i, agent in enumerate(agents):
+            if agent.uses_llm:
+                by_model.setdefault(agent.model_name, []).append(i)
+            else:
+                responses[i] = agent.respond(requests[i])
+
+        for model_name, indices in by_model.items():
+            prompts = [
+                (requests[i]["system"], requests[i]["user"], requests[i]["temperature"], {
+                    "agent_name": agents[i].name,
+                    "call_type": requests[i].get("call_type"),
+                    "options": requests[i].get("options"),
+                    "static_system": requests[i].get("static_system", False),
+                })
+                for i in indices
+            ]
+            outputs = agents[indices[0]].llm.generate_batch(model_name, prompts)
+            for i, output in zip(indices, outputs):
+                responses[i] = output
+        return responses
+
     def _reset_action_counts(self):
         for agent in self.agents:
             if self.state.world_data["agents"][agent.name]["status"] == "active":
@@ -155,6 +199,7 @@ class GameEngine:
 
     def run_discussion_phase(self, round_num):
         self.logger.write_log("discussion", None, f"\n=== Round {round_num} ===")
+        Telemetry.get_instance().set_context(phase="discussion", round=round_num, tick=None)
         reason = self.state.world_data["global"]["meeting_reason_log"]
         if reason:
             self.logger.write_log("discussion", None, reason)
@@ -192,6 +237,7 @@ class GameEngine:
                 self.state.save_json()
 
         self.state.update_phase("VOTING") 
+        Telemetry.get_instance().set_context(phase="vote")
         # 2. Voting
         votes = {}
         for agent in active_agents:
@@ -286,8 +332,13 @@ class GameEngine:
         """Calculates final game stats (won/loss) and exports to CSV."""
         winning_team_role = "honest" if "Honest" in result else "byzantine"
         
+        llm_counters = ModelManager.get_instance().agent_counters
+        telemetry = Telemetry.get_instance()
+        llm_totals = telemetry.agent_totals()
         for agent_name, data in self.state.world_data["agents"].items():
             stats = data["stats"]
+            stats.update(llm_counters.get(agent_name, {}))
+            stats.update(llm_totals.get(agent_name, {}))
             
             # Determine Win
             if data["role"] == winning_team_role:
@@ -300,4 +351,5 @@ class GameEngine:
         self.state.save_json()
                         
         # Export
-        self.logger.export_stats(self.state.world_data["agents"])
\ No newline at end of file
+        self.logger.export_stats(self.state.world_data["agents"])
+        telemetry.close()
\ No newline at end of file
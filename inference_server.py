@@ -0,0 +1,222 @@
+# inference_server.py
+# Node-local inference daemon shared by every game process on the node.
+# Each model is loaded once; requests from all games are queued per model and batched together,
+# grouped into prompt-length buckets so short prompts are not padded up to long ones.
+#   python inference_server.py --models meta-llama/Llama-3.1-8B-Instruct &
+#   python main.py --backend daemon
+import argparse
+import itertools
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+import core.llm as llm
+from core.llm import ModelManager, DeadlineExceeded, MISSED_DEADLINE
+from core.telemetry import Telemetry
+from config.settings import DAEMON_SOCKET, DAEMON_MAX_BATCH, DAEMON_BATCH_WINDOW, DAEMON_LENGTH_BUCKETS
+
+
+def length_bucket(prompt):
+    """Index of the smallest DAEMON_LENGTH_BUCKETS bound (in approx. tokens) the prompt fits in."""
+    approx_tokens = (len(prompt[0]) + len(prompt[1])) // 4
+    for i, bound in enumerate(DAEMON_LENGTH_BUCKETS):
+        if approx_tokens <= bound:
+            return i
+    return len(DAEMON_LENGTH_BUCKETS)
+
+
+class ModelScheduler(threading.Thread):
+    """
+    Serves one model. Each scheduling step takes everything queued (waiting up to DAEMON_BATCH_WINDOW
+    for more, at most DAEMON_MAX_BATCH), runs one generate_batch per (length bucket, temperature) group,
+    and immediately starts the next step with whatever arrived meanwhile.
+    Steps of all models share compute_lock: each backend call already uses every CPU thread of the
+    backend's execution config, so concurrent steps of different models would only oversubscribe the cores.
+    Requests keep queueing meanwhile and join the next step's batch.
+    """
+    def __init__(self, manager, model_name, compute_lock):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.model_name = model_name
+        self.compute_lock = compute_lock
+        self.telemetry_ids = itertools.count()
+        self.queue = queue.Queue()
+        self.steps = 0
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, op, payload):
+        future = Future()
+        self.queue.put((op, payload, future))
+        return future
+
+    def run(self):
+        while True:
+            pending = [self.queue.get()]
+            deadline = time.monotonic() + DAEMON_BATCH_WINDOW
+            while len(pending) < DAEMON_MAX_BATCH:
+                timeout = deadline - time.monotonic()
+                try:
+                    pending.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.compute_lock:
+                self._step(pending)
+
+    def _step(self, pending):
+        self.steps += 1
+        self.requests += len(pending)
+        groups = {}
+        for op, payload, future in pending:
+            if op == "score":
+                self._resolve(future, lambda: self.manager.score_options(
+                    self.model_name, payload["system"], payload["user"], payload["options"], agent_name=payload.get("agent_name")
+                ))
+            else:
+                # Tag the request so the backend's measurements can be sent back with the answer
+                meta = dict(payload[3] if len(payload) > 3 else {}, telemetry_id=next(self.telemetry_ids))
+                prompt = tuple(payload[:3]) + (meta,)
+                groups.setdefault((length_bucket(prompt), prompt[2]), []).append((prompt, future))
+
+        for group in groups.values():
+            self.batches += 1
+            prompts = [prompt for prompt, _ in group]
+            try:
+                # Failed requests (after the manager's retries) come back as None; requests past their
+                # deadline are reported back so the game process applies its own fallback
+                results = self.manager.generate_batch(self.model_name, prompts, on_failure=None, on_deadline=MISSED_DEADLINE)
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            for (prompt, future), result in zip(group, results):
+                usage = Telemetry.get_instance().take(prompt[3]["telemetry_id"])
+                if result is MISSED_DEADLINE:
+                    future.set_exception(DeadlineExceeded("missed its deadline in the inference daemon"))
+                elif result is None:
+                    future.set_exception(RuntimeError("inference failed after retries"))
+                else:
+                    future.set_result((result, usage))
+
+    def _resolve(self, future, fn):
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "steps": self.steps,
+            "batches": self.batches,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class InferenceDaemon:
+    def __init__(self):
+        self.manager = ModelManager.get_instance()
+        self.schedulers = {}
+        self.load_lock = threading.Lock()  # guards load_locks
+        self.load_locks = {}  # model_name -> lock held while that model loads
+        self.compute_lock = threading.Lock()  # one model step at a time, see ModelScheduler
+
+    def ensure_model(self, model_name):
+        # Requests for loaded models never wait on a load; several games asking for the same new model
+        # at startup load it once, while other models load concurrently
+        scheduler = self.schedulers.get(model_name)
+        if scheduler is not None:
+            return scheduler
+        with self.load_lock:
+            model_lock = self.load_locks.setdefault(model_name, threading.Lock())
+        with model_lock:
+            if model_name not in self.schedulers:
+                self.manager.load_model(model_name)
+                scheduler = ModelScheduler(self.manager, model_name, self.compute_lock)
+                scheduler.start()
+                self.schedulers[model_name] = scheduler
+        return self.schedulers[model_name]
+
+    def submit(self, request):
+        op = request.get("op")
+        if op == "load":
+            future = Future()
+            try:
+                self.ensure_model(request["model"])
+                future.set_result(True)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if op == "stats":
+            future = Future()
+            future.set_result({name: s.stats() for name, s in list(self.schedulers.items())})
+            return future
+
+        scheduler = self.ensure_model(request["model"])
+        return scheduler.submit(op, request if op == "score" else request["prompt"])
+
+
+def make_handler(daemon):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+            for line in self.rfile:
+                request = json.loads(line)
+                future = daemon.submit(request)
+                future.add_done_callback(
+                    lambda f, rid=request.get("id"), op=request.get("op"): self._reply(rid, op, f, write_lock)
+                )
+
+        def _reply(self, request_id, op, future, write_lock):
+            error = future.exception()
+            reply = {"id": request_id}
+            if error is None and op == "generate":
+                # The backend's token counts and timings (None when answered from the response cache)
+                reply["result"], reply["usage"] = future.result()
+            elif error is None:
+                reply["result"] = future.result()
+            else:
+                reply["error"] = str(error)
+                reply["deadline"] = isinstance(error, DeadlineExceeded)
+            try:
+                with write_lock:
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+            except (OSError, ValueError):
+                pass  # game process went away
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=DAEMON_SOCKET)
+    parser.add_argument("--models", nargs="*", default=[], help="Models to load before accepting games")
+    parser.add_argument("--backend", default="transformers", help="Backend serving plain model ids")
+    args = parser.parse_args()
+
+    # The daemon itself must not route back to the daemon
+    llm.set_default_backend(args.backend)
+    Telemetry.get_instance().capture()
+    daemon = InferenceDaemon()
+    for model_name in args.models:
+        daemon.ensure_model(model_name)
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    server = socketserver.ThreadingUnixStreamServer(args.socket, make_handler(daemon))
+    server.daemon_threads = True
+    print(f"Inference daemon listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        for name, scheduler in daemon.schedulers.items():
+            print(f"{name}: {scheduler.stats()}")
+        os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,25 @@ from datetime import datetime
 import time
 from uuid import uuid4
 from config.settings import NUM_ROUNDS
-from config.model_composition import COMPOSITION
+from config.model_composition import COMPOSITION, HEURISTIC
 from game.game_engine import GameEngine
-from core.llm import ModelManager
+from core.llm import ModelManager, set_default_backend
 import random
 
 def main():
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--job_index", type=int, default=0, help="Slurm Array Task ID")
+    parser.add_argument("--scenario", type=int, default=6, help="Index into COMPOSITION")
+    parser.add_argument("--backend", default=None, help="Backend for plain model ids (transformers, daemon, openai)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for agent shuffling and start rooms")
     args = parser.parse_args()
+    if args.backend:
+        set_default_backend(args.backend)
+    if args.seed is not None:
+        random.seed(args.seed)
 
-    scenario_idx = 6
+    scenario_idx = args.scenario
     selected_composition = COMPOSITION[scenario_idx]
     game_id = f"{selected_composition['name']}_Job{args.job_index}_{datetime.now().strftime('%m%d_%H%M')}"
     engine = GameEngine(
@@ -25,10 +32,16 @@ def main():
     
     # Preload Model
     manager = ModelManager.get_instance()
+    manager.seed = args.seed
     all_models_list = selected_composition['honest_model'] + selected_composition['byzantine_model']
-    unique_models = set(all_models_list)
-    for model in unique_models:
-        manager.load_model(model)
+    manager.configure(selected_composition)
+    unique_models = sorted((
+        set(all_models_list)
+        | set(selected_composition.get("draft_models", {}).values())
+        | set(selected_composition.get("fallback_models", {}).values())
+    ) - {HEURISTIC})  # rule-based seats have nothing to load
+    load_seconds = manager.preload(unique_models)
+    print(f"Loaded {len(unique_models)} model(s) in {load_seconds:.1f}s")
     
     engine.setup(composition=selected_composition)
     final_result = None
@@ -55,6 +68,9 @@ def main():
         final_result = "Honest Agents Win, Max Rounds Reached"
         engine.finalize_stats(final_result) 
     print(f"Game Over. Result: {final_result}")
+    backend_stats = manager.stats()
+    if backend_stats:
+        print(f"Backend Stats: {backend_stats}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+# quantize_models.py
+# Builds the pre-quantized CPU checkpoints (QUANTIZED_CACHE_DIR) for a composition's models and reports
+# memory, load time and generation speed of the quantized model against float32:
+#   python quantize_models.py --scenario 6 --scheme int8_dynamic
+import argparse
+import time
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from config.model_composition import COMPOSITION
+from core.hf_backend import benchmark_generate, load_quantized_cpu, model_nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", type=int, default=6, help="Index into COMPOSITION")
+    parser.add_argument("--models", nargs="*", default=None, help="Model ids (overrides --scenario)")
+    parser.add_argument("--scheme", default="int8_dynamic")
+    parser.add_argument("--new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    models = args.models
+    if models is None:
+        composition = COMPOSITION[args.scenario]
+        # Only Hugging Face ids are quantized, "<backend>:<spec>" names are served elsewhere
+        models = sorted({m for m in composition["honest_model"] + composition["byzantine_model"] if ":" not in m})
+
+    for model_name in models:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        start = time.perf_counter()
+        model = AutoModelForCausalLM.from_pretrained(model_name, device_map="cpu", torch_dtype=torch.float32)
+        fp32_load = time.perf_counter() - start
+        fp32_bytes = model_nbytes(model)
+        _, fp32_rate = benchmark_generate(model, tokenizer, args.new_tokens, args.repeats)
+        del model
+
+        # First call quantizes and writes the cache (unless it already exists), second call times a cached load
+        load_quantized_cpu(model_name, args.scheme)
+        start = time.perf_counter()
+        model, _ = load_quantized_cpu(model_name, args.scheme)
+        quant_load = time.perf_counter() - start
+        quant_bytes = model_nbytes(model)
+        _, quant_rate = benchmark_generate(model, tokenizer, args.new_tokens, args.repeats)
+        del model
+
+        print(f"\n{model_name} ({args.scheme}, {args.new_tokens} new tokens)")
+        print(f"  memory : {fp32_bytes / 1024**3:.2f} GB -> {quant_bytes / 1024**3:.2f} GB ({fp32_bytes / quant_bytes:.1f}x smaller)")
+        print(f"  load   : {fp32_load:.1f}s -> {quant_load:.1f}s")
+        print(f"  speed  : {fp32_rate:.1f} -> {quant_rate:.1f} tokens/s ({quant_rate / fp32_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,7 +31,8 @@ def aggregate_logs(logs_dir="logs"):
         "correct_votes", "incorrect_votes", "skipped_votes",
         "emergency_meetings", "bodies_reported", "rounds_survived",
         "eliminations", "won_game", "times_eliminated", "ejections",
-        "num_moves", "votes_received"
+        "num_moves", "votes_received", "llm_failures", "llm_retries", "llm_fallbacks",
+        "llm_calls", "total_prompt_tokens", "total_new_tokens", "llm_seconds"
     ]
     
     # Filter to columns that actually exist in the CSVs
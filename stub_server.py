@@ -0,0 +1,97 @@
+# stub_server.py
+# Minimal OpenAI-compatible /v1/chat/completions server backed by the stub backend.
+# Used to exercise the "openai:" backend (pooling, concurrency, retries) without a GPU:
+#   python stub_server.py --port 8000 --latency 0.05 --fail_rate 0.1
+import argparse
+import ast
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.stub_backend import StubBackend
+
+# Like a real endpoint the server only sees the messages; the call type and options are read back from the
+# agents' prompts (agents/*_agent.py templates) so the stub picks valid moves and votes.
+OPTION_HEADERS = ("Actions:", "Available movement actions:", "Available map locations to move to:")
+CANDIDATES = re.compile(r"^Candidates: (\[.*\])\.?\s*$", re.MULTILINE)
+
+
+def request_meta(user_prompt):
+    """{"call_type", "options"} of a game prompt: a vote, a movement, or else a discussion message."""
+    match = CANDIDATES.search(user_prompt)
+    if match:
+        return {"call_type": "vote", "options": ast.literal_eval(match.group(1))}
+
+    # Rooms then special actions, the order the agents list them in their options
+    sections, header = {}, None
+    for line in user_prompt.splitlines():
+        line = line.strip()
+        if line in OPTION_HEADERS:
+            header = line
+        elif header and not line:
+            break
+        elif header:
+            sections.setdefault(header, []).append(line[2:] if line.startswith("- ") else line)
+    if sections:
+        actions = sections.pop("Actions:", [])
+        return {"call_type": "movement", "options": [opt for rooms in sections.values() for opt in rooms] + actions}
+    return {"call_type": "discussion"}
+
+
+def make_handler(backend, latency, fail_rate):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": "not found"})
+            if random.random() < fail_rate:
+                return self._send(503, {"error": "injected failure"})
+
+            time.sleep(latency)
+            messages = body.get("messages", [])
+            model = "stub:" + body.get("model", "random")
+            content = backend.generate_batch(model, [(
+                messages[0]["content"] if messages else "",
+                messages[-1]["content"] if messages else "",
+                body.get("temperature", 0.1),
+                request_meta(messages[-1]["content"] if messages else ""),
+            )])[0]
+            self._send(200, {
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            })
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--fail_rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(StubBackend(), args.latency, args.fail_rate))
+    print(f"Stub OpenAI server on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
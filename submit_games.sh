@@ -21,6 +21,9 @@ module load conda
 # 2. Activate Environment
 conda activate amongus
 
+# Keep OpenMP/MKL pools within the allocation (core/execution.py sizes torch's threads the same way)
+export OMP_NUM_THREADS=$SLURM_CPUS_PER_TASK
+
 # 4. Run the Game
 # pass the SLURM_ARRAY_TASK_ID as the 'job_index'.
 # main.py will use this to select the LLM composition and name the log files.
@@ -0,0 +1,67 @@
+# sweep_threads.py
+# Finds the CPU_WORKERS setting with the best throughput for a model on this allocation: one padded batch on
+# all threads against N concurrent single-stream workers with CPUS // N threads each.
+#   srun --cpus-per-task=4 python sweep_threads.py --model Qwen/Qwen2.5-1.5B-Instruct --requests 10
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from core.execution import ExecutionConfig, available_cpus
+from core.hf_backend import BENCHMARK_MESSAGES
+
+
+def run(model, tokenizer, requests, workers, new_tokens, execution):
+    """Seconds to answer `requests` identical movement prompts with `workers` concurrent streams."""
+    text = tokenizer.apply_chat_template(BENCHMARK_MESSAGES, add_generation_prompt=True, tokenize=False)
+    kwargs = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+                  pad_token_id=tokenizer.pad_token_id)
+
+    def generate(batch_size):
+        inputs = tokenizer([text] * batch_size, return_tensors="pt", padding=True, add_special_tokens=False)
+        with torch.no_grad():
+            model.generate(**inputs, **kwargs)
+
+    start = time.perf_counter()
+    if workers == 1:
+        generate(requests)  # one padded batch
+    else:
+        # Each worker sizes its own intra-op pool, like TransformersBackend's worker pool
+        with ThreadPoolExecutor(max_workers=workers, initializer=execution.init_worker) as pool:
+            list(pool.map(lambda _: generate(1), range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per tick (agents on this model)")
+    parser.add_argument("--new_tokens", type=int, default=10)
+    parser.add_argument("--cpus", type=int, default=None, help="Defaults to the detected allocation")
+    args = parser.parse_args()
+
+    cpus = args.cpus or available_cpus()
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+    model = AutoModelForCausalLM.from_pretrained(args.model, device_map="cpu", torch_dtype=torch.float32)
+
+    candidates = [w for w in (1, 2, 3, 4, 6, 8, 12, 16) if w <= min(cpus, args.requests)]
+    results = {}
+    run(model, tokenizer, 1, 1, 2, ExecutionConfig(cpus=cpus, workers=1))  # warm-up
+    for workers in candidates:
+        execution = ExecutionConfig(cpus=cpus, workers=workers)
+        execution.use(workers)
+        seconds = run(model, tokenizer, args.requests, workers, args.new_tokens, execution)
+        results[workers] = seconds
+        print(f"workers={workers:<3} threads/worker={execution.threads_per_worker:<3} "
+              f"{seconds:6.2f}s  {args.requests / seconds:6.2f} req/s  {args.requests * args.new_tokens / seconds:7.1f} tok/s")
+
+    best = min(results, key=results.get)
+    print(f"\nBest for {args.model} on {cpus} CPUs: CPU_WORKERS = {best} "
+          f"({results[1] / results[best]:.2f}x the single padded batch)")
+
+
+if __name__ == "__main__":
+    main()